@@ -2,11 +2,14 @@ from kivy.app import App
 
 from kivy.uix.screenmanager import ScreenManager, FallOutTransition, RiseInTransition
 
-from services.TopicService import TopicService
-from services.CategoryService import CategoryService
+from services.CachedTopicService import CachedTopicService
+from services.CachedCategoryService import CachedCategoryService
 from services.GuestService import GuestService
+from services.UsageTracker import UsageTracker
+from services.PopularityRanker import PopularityRanker
 
 from database.database_manager import Manager
+from database.mirror_manager import MirrorManager
 
 from hardware.tlv493d import TLV493D
 from hardware.JoystickManager import Joystick
@@ -22,6 +25,14 @@ from kivy.clock import Clock
 import threading
 
 class ColapsExplorerApp(App):
+    # topics and categories are read from an in-memory copy of the database, only guest entries go to the file.
+    # set to False to read straight from the file again
+    MIRROR_DATABASE = True
+    # e.g. "./query_stats.json" to time every query and write the statistics there on exit (python -m tools.query_stats to read them)
+    QUERY_STATS_PATH = None
+    # list the most viewed topics of a category first instead of sorting them by id
+    POPULAR_FIRST = False
+    
     def build(self):
         #to prevent loading libraries for the first time when entering topicdetailscreen 
         self._warm_up_imaging()
@@ -30,12 +41,34 @@ class ColapsExplorerApp(App):
         self.tlv = TLV493D()
         threading.Thread(target=self.tlv.start_reading, daemon=True).start()
         
-        db = Manager()
-        db.ensure_database_availability()
+        # pooled, as the services get used from more than just the kivy thread
+        self.db = Manager(pooled=True)
+        self.db.ensure_database_availability()
+        
+        self.mirror = None
+        read_db = self.db
+        if self.MIRROR_DATABASE:
+            self.mirror = MirrorManager(self.db.db_path)
+            # the watcher runs on its own thread, the caches are rebuilt on the kivy thread instead
+            self.mirror.add_reload_listener(lambda: Clock.schedule_once(self.on_database_reload))
+            self.mirror.start_watching()
+            read_db = self.mirror
+        
+        if self.QUERY_STATS_PATH:
+            stats = self.db.enable_stats(slow_ms=20)
+            if self.mirror:
+                self.mirror.enable_stats(stats)
         
-        ts=TopicService(db)
-        cs=CategoryService(db)
-        gs=GuestService(db)
+        # the explorer only reads topics and categories, so most screen changes can be answered from memory
+        self.ts=CachedTopicService(read_db)
+        self.cs=CachedCategoryService(read_db)
+        self.gs=GuestService(self.db, write_behind=True) #keeps the commit (fsync) off the ui thread
+        self.usage=UsageTracker(self.db) #into the file as well, never into the read-only mirror
+        self.usage.start()
+        self.ranker=None
+        if self.POPULAR_FIRST:
+            self.ranker=PopularityRanker(self.db) #recomputed every few minutes in the background
+            self.ranker.start()
         
         self.joystick = Joystick()
         if self.joystick.device:
@@ -45,9 +78,9 @@ class ColapsExplorerApp(App):
         self.sm = ScreenManager()
         startup_screen = StartupScreen(name="startup", js=self.joystick)
         waiting_screen= WaitingScreen(name="waiting")
-        self.topic_list_screen = TopicListScreen(name='topic_list', ts=ts, cs=cs, js=self.joystick)
-        detail_screen = TopicDetailScreen(name='topic_detail', js=self.joystick)
-        guest_book_screen=GuestBookScreen(name='guest',gs=gs, js=self.joystick)
+        self.topic_list_screen = TopicListScreen(name='topic_list', ts=self.ts, cs=self.cs, js=self.joystick, usage=self.usage, ranker=self.ranker)
+        detail_screen = TopicDetailScreen(name='topic_detail', js=self.joystick, usage=self.usage)
+        guest_book_screen=GuestBookScreen(name='guest',gs=self.gs, js=self.joystick)
         finish_screen=FinishScreen(name="finish", js=self.joystick)
         
         
@@ -88,9 +121,31 @@ class ColapsExplorerApp(App):
         Clock.schedule_interval(self.check_movement, 0.5)
         return False
     
+    def on_database_reload(self, *_):
+        """The content manager or config tool changed the database file, everything derived from the old copy is outdated"""
+        print("Database changed on disk, reloading")
+        self.ts.clear()
+        self.cs.clear()
+        self.topic_list_screen.reload_data()
+    
     def on_stop(self):
+        if self.mirror:
+            self.mirror.stop_watching()
         self.tlv.stop_reading()
         self.joystick.stop()
+        if self.ranker:
+            self.ranker.stop()
+        
+        pending = self.gs.pending_entries()
+        if pending:
+            print(f"Writing {pending} remaining guest entries")
+        if not self.gs.stop(timeout=10):
+            print(f"{self.gs.pending_entries()} guest entries could not be written")
+        if not self.usage.stop(timeout=5):
+            print(f"{self.usage.pending()} usage events could not be written")
+        if self.QUERY_STATS_PATH:
+            self.db.dump_stats(self.QUERY_STATS_PATH)
+        self.db.close()
         
     def _warm_up_imaging(self):
         """Used to preload pillow plugins on application startup"""
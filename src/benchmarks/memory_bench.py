@@ -0,0 +1,87 @@
+"""Compares how much memory the record types need when a whole catalog is loaded.
+The plain dataclasses the services used before are rebuilt here, so both versions run against the same rows.
+Run from the src folder, e.g.:
+    python -m benchmarks.memory_bench --scale 100k"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date
+
+from benchmarks.synthetic import SCALES, generate_database
+from data.Topic import Topic
+from data.Guest import Guest
+
+
+@dataclass
+class PlainTopic:
+    id: int
+    title: str
+    description: str
+    source: str
+
+
+@dataclass
+class PlainGuest:
+    id: int | None
+    name: str
+    institution: str
+    role: str
+    purpose_of_visit: str
+    date: date | None
+
+
+def measure(load) -> dict:
+    """Memory still held by the result of load() and how long it took. The rows themselves are counted too.
+    Timed in a separate call, tracemalloc slows down every allocation"""
+    gc.collect()
+    start = time.perf_counter()
+    records = load()
+    elapsed = time.perf_counter() - start
+    del records
+
+    gc.collect()
+    tracemalloc.start()
+    records = load()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"records": len(records), "held_mb": held / 2**20, "peak_mb": peak / 2**20, "seconds": elapsed}
+
+
+def run(topics: int, guests: int) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        db = generate_database(os.path.join(folder, "bench.db"), topics, guests=guests)
+
+        # SELECT * and a sort in Python, like the services did before
+        loads = {
+            "topics, plain dataclass": lambda: sorted([PlainTopic(*row) for row in db.execute("SELECT * from topics").fetchall()], key=lambda x: x.id),
+            "topics, slotted record": lambda: [Topic(*row) for row in db.execute("SELECT id, title, description, source from topics ORDER BY id").fetchall()],
+            "guests, plain dataclass": lambda: sorted([PlainGuest(*row) for row in db.execute("SELECT * FROM guests").fetchall()], key=lambda x: x.id),
+            "guests, slotted record": lambda: [Guest(*row) for row in db.execute("SELECT id, name, institution, role, purpose_of_visit, date FROM guests ORDER BY id").fetchall()],
+        }
+
+        results = {}
+        for name, load in loads.items():
+            results[name] = measure(load)
+            r = results[name]
+            print(f"{name:<25} {r['records']:>8} rows  held {r['held_mb']:>8.1f} MB  peak {r['peak_mb']:>8.1f} MB  {r['seconds']*1000:>8.1f} ms")
+        db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES.keys(), default="100k")
+    parser.add_argument("--topics", type=int)
+    parser.add_argument("--guests", type=int)
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    run(args.topics or scale["topics"], args.guests if args.guests is not None else scale["guests"])
+
+
+if __name__ == "__main__":
+    main()
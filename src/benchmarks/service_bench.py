@@ -0,0 +1,126 @@
+"""Times the service layer against a generated database. Needs no window and no hardware.
+Run from the src folder, e.g.:
+    python -m benchmarks.service_bench --scale 10k --save benchmarks/baseline_10k.json
+    python -m benchmarks.service_bench --scale 10k --compare benchmarks/baseline_10k.json
+Exits with 1 if an operation got slower than the baseline by more than the tolerance."""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import SCALES, WORDS, generate_database
+from services.TopicService import TopicService
+from services.CategoryService import CategoryService
+from services.GuestService import GuestService
+
+
+def time_operation(operation, repeat: int) -> dict:
+    """operation() is called repeat times (after one warm up call), returns per call timings in ms"""
+    operation()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"median_ms": statistics.median(timings),
+            "p95_ms": timings[min(len(timings)-1, int(len(timings)*0.95))],
+            "min_ms": timings[0],
+            "calls": repeat}
+
+
+def run(topics: int, categories: int, assignments: int, guests: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        db = generate_database(os.path.join(folder, "bench.db"), topics, categories, assignments, guests, seed)
+        print(f"Generated {topics} topics, {guests} guests in {time.perf_counter()-start:.1f} s")
+        
+        ts = TopicService(db)
+        cs = CategoryService(db)
+        gs = GuestService(db)
+        
+        # the slow ones run less often, listing 100k rows a hundred times would take ages
+        few = max(5, repeat // 5)
+        operations = {
+            "TopicService.list_all": (ts.list_all, few),
+            "TopicService.list_by_category": (lambda: ts.list_by_category(rng.randint(1, categories)), few),
+            "TopicService.summary_page": (lambda: ts.list_summaries_by_category(rng.randint(1, categories)), repeat),
+            "TopicService.get_many(100)": (lambda: ts.get_many(rng.sample(range(1, topics+1), min(100, topics))), repeat),
+            "TopicService.search": (lambda: ts.search(rng.choice(WORDS)[:4]), repeat),
+            "CategoryService.get_for_angle": (lambda: cs.get_for_angle(rng.randint(0, 359)), repeat),
+            "TopicService.set_assignment": (lambda: ts.set_assignment(rng.randint(1, topics), rng.sample(range(1, categories+1), 2)), repeat),
+            "GuestService.list": (gs.list, few),
+            "GuestService.list_page(name)": (lambda: gs.list_page(name=f"guest {rng.randint(1, 99)}"), repeat),
+            "GuestService.list_page(institution)": (lambda: gs.list_page(institution=rng.choice(("ude", "RUB", "TU Dortmund"))), repeat),
+        }
+        
+        results = {}
+        for name, (operation, calls) in operations.items():
+            results[name] = time_operation(operation, calls)
+            print(f"{name:<35} median {results[name]['median_ms']:>10.3f} ms   p95 {results[name]['p95_ms']:>10.3f} ms")
+        db.close()
+    
+    return {"config": {"topics": topics, "categories": categories, "assignments_per_topic": assignments, "guests": guests, "repeat": repeat, "seed": seed},
+            "machine": {"python": platform.python_version(), "platform": platform.platform()},
+            "created": time.time(),
+            "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Returns the names of all operations whose median got slower than baseline * (1 + tolerance)"""
+    if current["config"] != baseline["config"]:
+        print("Warning: the baseline was recorded with a different configuration, the comparison is meaningless")
+    
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        change = result["median_ms"] / old["median_ms"] - 1 if old["median_ms"] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  <-- REGRESSION"
+        print(f"{name:<35} {old['median_ms']:>10.3f} -> {result['median_ms']:>10.3f} ms  {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES.keys(), default="1k", help="preset sizes, the options below override single values")
+    parser.add_argument("--topics", type=int)
+    parser.add_argument("--categories", type=int)
+    parser.add_argument("--assignments", type=int, default=2, help="category assignments per topic")
+    parser.add_argument("--guests", type=int)
+    parser.add_argument("--repeat", type=int, default=100, help="calls per fast operation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results as json baseline to this path")
+    parser.add_argument("--compare", help="baseline json to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging, 0.25 = 25%%")
+    args = parser.parse_args()
+    
+    scale = SCALES[args.scale]
+    results = run(args.topics or scale["topics"], args.categories or scale["categories"], args.assignments,
+                  args.guests if args.guests is not None else scale["guests"], args.repeat, args.seed)
+    
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared to {args.compare} (tolerance {args.tolerance:.0%}):")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Generates databases with made up content in the regular schema, for benchmarks"""
+import random
+from datetime import datetime, timedelta
+
+from database.database_manager import Manager
+
+WORDS = ("learning education data science ai intelligent tutoring system analytics student teacher course "
+         "programming feedback assessment research method review study design virtual reality game "
+         "collaborative online open knowledge model language support adaptive environment digital").split()
+
+SCALES = {
+    "1k": {"topics": 1_000, "categories": 9, "guests": 1_000},
+    "10k": {"topics": 10_000, "categories": 9, "guests": 10_000},
+    "100k": {"topics": 100_000, "categories": 9, "guests": 100_000},
+}
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def generate_database(path: str, topics: int, categories: int = 9, assignments_per_topic: int = 2, guests: int = 1000, seed: int = 1) -> Manager:
+    """Creates a database at path (should not exist yet) and fills it. The same seed always gives the same content"""
+    rng = random.Random(seed)
+    db = Manager(path)
+    db.ensure_database_availability()
+    
+    with db.transaction():
+        width = 360 // categories
+        db.execute_many("INSERT INTO categories (title, angle_begin, angle_end) VALUES (?, ?, ?)",
+                        [(f"Category {i}", i*width, (i+1)*width - 1 if i < categories-1 else 359) for i in range(categories)])
+        
+        db.execute_many("INSERT INTO topics (title, description, source) VALUES (?, ?, ?)",
+                        ((f"{_sentence(rng, 5).title()} {i}", _sentence(rng, 60), f"https://example.org/{i}") for i in range(1, topics+1)))
+        
+        assignments = set()
+        for topic_id in range(1, topics+1):
+            for _ in range(assignments_per_topic):
+                assignments.add((topic_id, rng.randint(1, categories)))
+        db.execute_many("INSERT INTO topicAssignment (topic_id, category_id) VALUES (?, ?)", sorted(assignments))
+        
+        start = datetime(2024, 1, 1)
+        db.execute_many("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES (?, ?, ?, ?, ?)",
+                        ((f"Guest {i}", rng.choice(("UDE", "RUB", "TU Dortmund", "")), rng.choice(("Student", "Researcher", "Teacher", "")),
+                          rng.randint(0, 5), str(start + timedelta(minutes=i*17))) for i in range(guests)))
+    return db
@@ -6,7 +6,7 @@ from kivy.uix.button import Button
 from kivy.uix.behaviors import FocusBehavior
 from kivy.core.window import Window
 from kivy.graphics import Color, Rectangle, Line
-from kivy.properties import StringProperty, NumericProperty
+from kivy.properties import StringProperty, NumericProperty, BooleanProperty
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.boxlayout import BoxLayout
@@ -16,23 +16,49 @@ from kivy.uix.label import Label
 from kivy.uix.stacklayout import StackLayout
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.popup import Popup
+from kivy.graphics import RoundedRectangle
+from kivy.clock import Clock
 
 import time
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from bisect import bisect_left
 
 from database.database_manager import Manager
 from services.CategoryService import CategoryService
 from services.TopicService import TopicService
+from services.ChangeJournal import ChangeJournal
 
 from ui.SelectableButton import SelectableButton 
 from ui.LabeledCheckbox import LabeledCheckbox
+from services.TopicFilterIndex import TopicFilterIndex
 
 
 class CMSelectableButton(SelectableButton):
+    selected = BooleanProperty(False) #part of a multi selection, comes from the rv data as views get recycled
+    
+    def refresh_view_attrs(self, rv, index, data):
+        super().refresh_view_attrs(rv, index, data)
+        self.selected = data.get('selected', False)
+    
+    def on_selected(self, *_):
+        self.on_hovered(self, self.hovered)
+    
+    def on_hovered(self, instance, hovered):
+        if not self.selected:
+            return super().on_hovered(instance, hovered)
+        self.canvas.before.clear()
+        with self.canvas.before:
+            Color(rgba=(0.55, 0.7, 1, 1))
+            RoundedRectangle(pos=self.pos, size=self.size, radius=[12])
+    
     #overwriting with custom press behaviour
     def on_press(self):
         cm = self.get_root_window().children[0]
-        if hasattr(cm, 'update_editing_block_fields'):
-            cm.update_editing_block_fields(self.db_id)
+        if hasattr(cm, 'select_item'):
+            # ctrl adds/removes single items, shift selects everything up to the last clicked one
+            mode = "range" if "shift" in Window.modifiers else "toggle" if ("ctrl" in Window.modifiers or "meta" in Window.modifiers) else "single"
+            cm.select_item(self.db_id, mode)
 
 class ListSelector(RecycleView):
     """"The selection list used to select different topic/category items"""
@@ -55,6 +81,12 @@ class ListSelector(RecycleView):
         )
         recycle_layout.bind(minimum_height=recycle_layout.setter('height'))
 
+        self.content=None
+        self.entries={} #db_id -> row of everything loaded, data only holds the rows matching the filter
+        self.filter_text=""
+        self.filter_index=TopicFilterIndex()
+        self.selected=set() #db_ids
+        self._anchor=None #last item clicked without shift, start of range selections
         self.update_content(content='start')
 
         
@@ -62,19 +94,129 @@ class ListSelector(RecycleView):
         self.viewclass='CMSelectableButton'
 
     def update_content(self, content):
-        """content has to be 'topics' or 'categories'"""
+        """content has to be 'topics' or 'categories'. Loads the whole list, afterwards use add_item/remove_item/rename_item"""
+        self.content=content
+        self.selected=set()
+        self._anchor=None
         
         if content == 'topics':
             topics = self.topic_service.list_all()
-            self.data=[{'text' : f"{topic.id} {topic.title}", 'db_id': topic.id} for topic in topics]
+            self.filter_index.build(topics, self.topic_service.list_all_assignments(), self.category_service.list())
+            self.entries={topic.id: self._entry(topic.id, topic.title) for topic in topics}
         elif content == 'categories':
             categories = self.category_service.list()
-            self.data=[{'text' : f"{cat.id} {cat.title}", 'db_id': cat.id} for cat in categories]
+            self.filter_index.build(categories)
+            self.entries={cat.id: self._entry(cat.id, cat.title) for cat in categories}
         elif content == 'test':
-            self.data=[{'text': f"Item {i} 123456789", 'db_id': i+100} for i in range(10)] #something longer to test line wrapping
+            self.entries={i+100: {'text': f"Item {i} 123456789", 'db_id': i+100} for i in range(10)} #something longer to test line wrapping
+        else:
+            self.entries={0: {'text': "Please select data type to load", 'db_id': 0}}
+        self.show_filtered()
+    
+    def set_filter(self, text: str):
+        """Narrows the list down to items whose id, title or category titles start with the typed words"""
+        self.filter_text=text
+        self.show_filtered()
+        self.scroll_y=1
+    
+    def is_filtered(self) -> bool:
+        return self.content in ('topics', 'categories') and self.filter_index.filter(self.filter_text) is not None
+    
+    def show_filtered(self):
+        ids = self.filter_index.filter(self.filter_text) if self.content in ('topics', 'categories') else None
+        self.data=[self.entries[id] for id in (sorted(self.entries) if ids is None else ids)]
+        self.refresh_from_data()
+    
+    def select(self, db_id: int, mode: str = "single"):
+        """mode "single" selects only db_id, "toggle" adds/removes it, "range" selects everything shown between the last clicked item and db_id"""
+        old = set(self.selected)
+        shown = [entry['db_id'] for entry in self.data]
+        if mode == "range" and self._anchor in shown and db_id in shown:
+            a, b = sorted((shown.index(self._anchor), shown.index(db_id)))
+            self.selected |= set(shown[a:b+1])
+        elif mode == "toggle":
+            self.selected ^= {db_id}
+            self._anchor = db_id
         else:
-            self.data=[{'text': "Please select data type to load", 'db_id': 0}]
+            self.selected = {db_id}
+            self._anchor = db_id
+        
+        for id in old ^ self.selected:
+            if id in self.entries:
+                self.entries[id]['selected'] = id in self.selected #data holds the same dicts
         self.refresh_from_data()
+    
+    def selected_ids(self) -> list:
+        return sorted(self.selected & self.entries.keys())
+    
+    def change_assignments(self, db_ids, add=(), remove=()):
+        """Call after TopicService.bulk_assign, keeps the filter up to date"""
+        self.filter_index.change_assignments(db_ids, add, remove)
+        if self.is_filtered():
+            with self._keep_scroll_position():
+                self.show_filtered()
+    
+    @staticmethod
+    def _entry(db_id: int, title: str, selected: bool = False) -> dict:
+        return {'text' : f"{db_id} {title}", 'db_id': db_id, 'selected': selected}
+    
+    def _index_of(self, db_id: int) -> int:
+        """position of db_id in data (or where it belongs), the lists are sorted by id"""
+        return bisect_left(self.data, db_id, key=lambda entry: entry['db_id'])
+    
+    def add_item(self, db_id: int, title: str):
+        self.entries[db_id]=self._entry(db_id, title)
+        self.filter_index.set_item(db_id, title)
+        with self._keep_scroll_position():
+            if self.is_filtered():
+                self.show_filtered() #a few ms even for large lists, simpler than working out if the new item matches
+            else:
+                self.data.insert(self._index_of(db_id), self.entries[db_id])
+    
+    def remove_item(self, db_id: int):
+        self.entries.pop(db_id, None)
+        self.selected.discard(db_id)
+        self.filter_index.remove_item(db_id)
+        i = self._index_of(db_id)
+        if i < len(self.data) and self.data[i]['db_id'] == db_id:
+            with self._keep_scroll_position():
+                del self.data[i]
+    
+    def rename_item(self, db_id: int, title: str):
+        if db_id not in self.entries:
+            return
+        self.entries[db_id]=self._entry(db_id, title, db_id in self.selected)
+        self.filter_index.set_item(db_id, title)
+        if self.is_filtered():
+            with self._keep_scroll_position():
+                self.show_filtered() #might not match anymore
+            return
+        i = self._index_of(db_id)
+        if i < len(self.data) and self.data[i]['db_id'] == db_id:
+            self.data[i] = self.entries[db_id] #same height, the scroll position doesn't move
+    
+    def set_assignments(self, db_id: int, category_ids):
+        """Call after the categories of a topic changed, they are part of what the filter matches"""
+        self.filter_index.set_assignments(db_id, category_ids)
+        if self.is_filtered():
+            with self._keep_scroll_position():
+                self.show_filtered()
+    
+    @contextmanager
+    def _keep_scroll_position(self):
+        """scroll_y is relative to the content height, so it has to be recalculated once the layout got its new height"""
+        layout = self.children[0] if self.children else None
+        if layout is None or layout.height <= self.height:
+            yield
+            return
+        from_top = (1 - self.scroll_y) * (layout.height - self.height)
+        yield
+        
+        def restore(*_):
+            scrollable = layout.height - self.height
+            if scrollable > 0:
+                self.scroll_y = max(0.0, min(1.0, 1 - from_top / scrollable))
+        Clock.schedule_once(restore) #after the RecycleView laid out the new data
         
     def scroll_to_end(self):
         if self.data:
@@ -119,6 +261,51 @@ class ConfirmPopup(Popup):
             self.callback(False)
         self.dismiss()
 
+class BulkCategoryPopup(Popup):
+    """Pick categories to add to or remove from all selected topics. callback(add, category_ids) with add False for removing"""
+    def __init__(self, categories, topic_count: int, callback, **kwargs):
+        super().__init__(**kwargs)
+        self.callback = callback
+        
+        popup_layout = BoxLayout(orientation="vertical", spacing=dp(10))
+        
+        self.category_box = StackLayout(orientation='lr-tb', size_hint_y=None, spacing=dp(5), padding=dp(5))
+        self.category_box.bind(minimum_height=self.category_box.setter('height'))
+        for category in categories:
+            checkbox = LabeledCheckbox(text=category.title, category_id=category.id)
+            checkbox.label.color = checkbox.checkbox.color = (1,1,1,1) #popup background is dark
+            self.category_box.add_widget(checkbox)
+        scroll_view = ScrollView(do_scroll_x=False)
+        scroll_view.add_widget(self.category_box)
+        
+        button_layout = BoxLayout(orientation="horizontal", size_hint_y=None, height=dp(40))
+        for text, handler in (("Cancel", self._cancel), ("Remove", self._remove), ("Add", self._add)):
+            button = Button(text=text)
+            button.bind(on_press=handler)
+            button_layout.add_widget(button)
+        
+        popup_layout.add_widget(scroll_view)
+        popup_layout.add_widget(button_layout)
+        
+        self.title=f"Categories of {topic_count} selected topics"
+        self.content=popup_layout
+        self.size_hint=(0.6, 0.6)
+        self.auto_dismiss=False
+    
+    def _checked(self):
+        return [checkbox.category_id for checkbox in self.category_box.children if checkbox.checked]
+    
+    def _add(self, _):
+        self.callback(True, self._checked())
+        self.dismiss()
+    
+    def _remove(self, _):
+        self.callback(False, self._checked())
+        self.dismiss()
+    
+    def _cancel(self, _):
+        self.dismiss()
+
 class TypeSelector(GridLayout, FocusBehavior, CompoundSelectionBehavior):
         """Selecting content type"""
         def __init__(self, ts: TopicService, cs: CategoryService, cm, **kwargs):
@@ -220,7 +407,7 @@ class MenuBar(GridLayout):
         self.category_service=cs
         self.cm=cm
         
-        self.cols=3
+        self.cols=6
         self.rows=1
         self.row_force_default=True
         self.row_default_height=50
@@ -239,10 +426,31 @@ class MenuBar(GridLayout):
                                     size_hint=(0.2, 0.8))
         remove_button.bind(on_press=self.show_popup)
         
+        bulk_button = Button(text="Categories of selected",
+                                    color=(1,1,1,1),
+                                    background_color=(200/255, 255/255, 255/255, 1),
+                                    size_hint=(0.2, 0.8))
+        bulk_button.bind(on_press=lambda _: self.cm.on_bulk_edit())
+        
+        undo_button = Button(text="Undo",
+                                    color=(1,1,1,1),
+                                    background_color=(200/255, 255/255, 255/255, 1),
+                                    size_hint=(0.1, 0.8))
+        undo_button.bind(on_press=lambda _: self.cm.on_undo())
+        
+        redo_button = Button(text="Redo",
+                                    color=(1,1,1,1),
+                                    background_color=(200/255, 255/255, 255/255, 1),
+                                    size_hint=(0.1, 0.8))
+        redo_button.bind(on_press=lambda _: self.cm.on_redo())
+        
         type_selector= TypeSelector(ts=self.topic_service, cs=self.category_service, cm=self.cm)
         
         self.add_widget(add_button)
         self.add_widget(remove_button)
+        self.add_widget(bulk_button)
+        self.add_widget(undo_button)
+        self.add_widget(redo_button)
         self.add_widget(type_selector)
         
         
@@ -250,7 +458,7 @@ class MenuBar(GridLayout):
         self.cm.on_add_item()
     
     def show_popup(self, _):
-        popup = ConfirmPopup(msg="Delete Topic? This action cannot be undone.", callback = self.on_confirm)
+        popup = ConfirmPopup(msg="Delete Topic? Undo (ctrl+z) brings it back.", callback = self.on_confirm)
         popup.open()
         
     def remove_items(self):
@@ -269,11 +477,18 @@ class EditingBlock(FloatLayout):
     db_id = NumericProperty(0) #add the id as a property to make updates possible
     content_type = StringProperty() #for table selection
     
-    def __init__(self, ts: TopicService, cs: CategoryService, **kwargs):
+    def __init__(self, ts: TopicService, cs: CategoryService, save_callback=None, journal: ChangeJournal | None = None, **kwargs):
+        """save_callback(content_type, db_id, changed_fields) gets called after something was saved. With a journal saving a topic is one undo step"""
         super().__init__(**kwargs)
         
         self.topic_service=ts
         self.category_service=cs
+        self.save_callback=save_callback
+        self.journal=journal
+        
+        # values as they were loaded (or last saved), saving only writes what differs from these
+        self.loaded_fields = {}
+        self.loaded_categories = set()
         
         #input for title box
         self.title_input = TextInput(text="", hint_text="Topic title", font_size="20sp", size_hint=(0.98, 0.08), pos_hint={'x': 0, 'y': 0.92})
@@ -310,20 +525,43 @@ class EditingBlock(FloatLayout):
         
         save_button.bind(on_press=self.save_changes)
         
+    def dirty_fields(self) -> dict:
+        """Fields whose input differs from the loaded value. Empty title/description keep the old value, like TopicService.update"""
+        current = {"title": self.title_input.text, "description": self.desc_input.text, "source": self.source_input.text}
+        if self.content_type=="categories":
+            current = {"title": current["title"]}
+        return {field: value for field, value in current.items()
+                if field in self.loaded_fields and value != self.loaded_fields[field] and (value or field == "source")}
+    
     def save_changes(self, _):
-        """Handles basic data processing for the services to save to DB"""
-        title = self.title_input.text
-        desc = self.desc_input.text
-        source = self.source_input.text
-        category_selection=[checkbox.category_id for checkbox in self.category_box.children if checkbox.checked]
+        """Handles basic data processing for the services to save to DB. Only changed fields and assignments are written"""
+        changed = self.dirty_fields()
         
         if self.content_type=="categories":
-            self.category_service.rename(self.db_id, title)
+            if changed:
+                self.category_service.rename(self.db_id, changed["title"])
+            self.loaded_fields.update(changed)
         elif self.content_type=="topics":
-            self.topic_service.update(self.db_id, title, desc, source)
-            self.topic_service.set_assignment(self.db_id, category_selection)
+            category_selection={checkbox.category_id for checkbox in self.category_box.children if checkbox.checked}
+            with self.journal.record(f"Edit topic {self.db_id}") if self.journal else nullcontext():
+                self.topic_service.update_fields(self.db_id, **changed)
+                self.topic_service.apply_assignment_diff(self.db_id, add=category_selection-self.loaded_categories, remove=self.loaded_categories-category_selection)
+            self.loaded_fields.update(changed)
+            if category_selection != self.loaded_categories:
+                changed["categories"]=category_selection #for the callback only, not a field
+                self.loaded_categories=category_selection
+        
+        if changed and self.save_callback:
+            self.save_callback(self.content_type, self.db_id, changed)
         
     
+    def change_assignments(self, add, remove):
+        """The shown topic's categories were changed elsewhere (bulk edit), unsaved text stays as it is"""
+        self.loaded_categories = (self.loaded_categories | set(add)) - set(remove)
+        for checkbox in self.category_box.children:
+            if checkbox.category_id in add or checkbox.category_id in remove:
+                checkbox.checkbox.active = checkbox.category_id in self.loaded_categories
+    
     def load_item_content(self, item_id, type):
         """Loads content for given item_id and type"""
         self.category_box.clear_widgets()
@@ -340,6 +578,8 @@ class EditingBlock(FloatLayout):
             self.title_input.text=topic.title
             self.desc_input.text=topic.description
             self.source_input.text=topic.source
+            self.loaded_fields={"title": topic.title, "description": topic.description, "source": topic.source}
+            self.loaded_categories=set(topic_in_category)
             
             for category in categories:
                 self.category_box.add_widget(LabeledCheckbox(text=category.title, category_id=category.id, checked=category.id in topic_in_category))
@@ -348,6 +588,8 @@ class EditingBlock(FloatLayout):
         elif type == "categories":
             self.title_input.text=self.category_service.get(item_id).title
             self.desc_input.text=""
+            self.loaded_fields={"title": self.title_input.text}
+            self.loaded_categories=set()
             
 
 
@@ -355,11 +597,12 @@ class EditingBlock(FloatLayout):
 
 class ContentManager(FloatLayout):
         # use this as central controller/interface for different window parts
-        def __init__(self, ts:TopicService, cs: CategoryService, **kwargs):
+        def __init__(self, ts:TopicService, cs: CategoryService, journal: ChangeJournal | None = None, **kwargs):
             super().__init__(**kwargs)
             
             self.topic_service=ts
             self.category_service=cs
+            self.journal=journal #undo/redo, optional
             
             self.orientation='horizontal'
             self.current_data_type = None #tracking which type is currently active (topics/cats)                meow
@@ -367,23 +610,35 @@ class ContentManager(FloatLayout):
 
             self.list_selector = ListSelector(size_hint=(0.2, 0.8), pos_hint={'x': 0.01, 'y': 0.05}, ts=self.topic_service, cs=self.category_service)
             self.add_widget(self.list_selector)
+            
+            #narrows the list while typing
+            self.filter_input = TextInput(text="", hint_text="Filter: id, title or category", font_size="16sp", multiline=False,
+                                          size_hint=(0.2, 0.05), pos_hint={'x': 0.01, 'y': 0.86})
+            self.filter_input.bind(text=lambda _, text: self.list_selector.set_filter(text))
+            self.add_widget(self.filter_input)
 
             #menu bar
             menu_bar = MenuBar(size_hint=(1, None), pos_hint={'top':0.97}, ts=self.topic_service, cs=self.category_service, cm=self)
             self.add_widget(menu_bar)
             
             #EditingBlock with input fields
-            self.editing_block = EditingBlock(size_hint=(0.74, 0.83), pos_hint={'x': 0.25, 'y': 0.02}, ts=self.topic_service, cs=self.category_service)
+            self.editing_block = EditingBlock(size_hint=(0.74, 0.83), pos_hint={'x': 0.25, 'y': 0.02}, ts=self.topic_service, cs=self.category_service, save_callback=self.on_item_saved, journal=self.journal)
             #editing_block.bind(pos=self.debug_bg_update, size=self.debug_bg_update)
             self.add_widget(self.editing_block)
+            
+            Window.bind(on_keyboard=self.on_keyboard)
 
         def on_add_item(self, *_):
             if self.current_data_type == "categories": #skip categories as we won't be handling those
                 return
             
-            self.topic_service.add_topic()
+            with self._record("Add topic"):
+                topic_id = self.topic_service.add_topic()
             
-            self.list_selector.update_content("topics")
+            if self.list_selector.content == "topics":
+                self.list_selector.add_item(topic_id, self.topic_service.get(topic_id).title)
+            else:
+                self.list_selector.update_content("topics")
             self.list_selector.scroll_to_end()
         
         def on_remove_item(self, *_):
@@ -391,11 +646,108 @@ class ContentManager(FloatLayout):
                 return
             
             id = self.editing_block.db_id
-            self.topic_service.remove_topic(id)
+            with self._record(f"Remove topic {id}"):
+                self.topic_service.remove_topic(id)
             
-            self.list_selector.update_content("topics")
+            if self.list_selector.content == "topics":
+                self.list_selector.remove_item(id)
+            else:
+                self.list_selector.update_content("topics")
+            
+        def on_item_saved(self, content_type, db_id, changed):
+            if content_type != self.list_selector.content:
+                return
+            if "title" in changed:
+                self.list_selector.rename_item(db_id, changed["title"])
+            if "categories" in changed:
+                self.list_selector.set_assignments(db_id, changed["categories"])
             
             
+        def select_item(self, db_id, mode="single"):
+            """Called when a button on the list is pressed. Only a plain click opens the item in the editor"""
+            self.list_selector.select(db_id, mode)
+            if mode == "single":
+                self.update_editing_block_fields(db_id)
+        
+        def on_bulk_edit(self, *_):
+            if self.current_data_type != "topics":
+                return
+            topic_ids = self.list_selector.selected_ids()
+            if not topic_ids:
+                return
+            BulkCategoryPopup(self.category_service.list(), len(topic_ids), lambda add, category_ids: self.apply_bulk(topic_ids, add, category_ids)).open()
+        
+        def apply_bulk(self, topic_ids, add, category_ids):
+            if not category_ids:
+                return
+            added, removed = (category_ids, ()) if add else ((), category_ids)
+            start = time.perf_counter()
+            try:
+                with self._record(f"{'Add' if add else 'Remove'} categories of {len(topic_ids)} topics"):
+                    self.topic_service.bulk_assign(topic_ids, added, removed) #one transaction, one commit
+            except Exception as e:
+                print(f"Changing the categories failed, nothing was changed: {e}")
+                return
+            print(f"{'Added' if add else 'Removed'} {len(category_ids)} categories for {len(topic_ids)} topics in {(time.perf_counter()-start)*1000:.0f} ms")
+            
+            self.list_selector.change_assignments(topic_ids, added, removed)
+            if self.editing_block.content_type == "topics" and self.editing_block.db_id in topic_ids:
+                self.editing_block.change_assignments(added, removed)
+        
+        def _record(self, label):
+            return self.journal.record(label) if self.journal else nullcontext()
+        
+        def on_keyboard(self, window, key, scancode, codepoint, modifiers):
+            if not ("ctrl" in modifiers or "meta" in modifiers) or codepoint not in ("z", "y"):
+                return False
+            if any(widget.focus for widget in (self.filter_input, self.editing_block.title_input, self.editing_block.desc_input, self.editing_block.source_input)):
+                return False #text inputs have their own undo
+            if codepoint == "y" or "shift" in modifiers:
+                self.on_redo()
+            else:
+                self.on_undo()
+            return True
+        
+        def on_undo(self, *_):
+            self._replay(undo=True)
+        
+        def on_redo(self, *_):
+            self._replay(undo=False)
+        
+        def _replay(self, undo):
+            if not self.journal:
+                return
+            label = self.journal.undo_label() if undo else self.journal.redo_label()
+            try:
+                affected = self.journal.undo() if undo else self.journal.redo()
+            except (ValueError, sqlite3.Error) as e:
+                print(f"{'Undo' if undo else 'Redo'} failed, nothing was changed: {e}")
+                return
+            if affected is None:
+                print(f"Nothing to {'undo' if undo else 'redo'}")
+                return
+            print(f"{'Undone' if undo else 'Redone'}: {label}")
+            self.show_changed_topics(affected["topics"], affected["assignments"])
+        
+        def show_changed_topics(self, topic_ids, assignment_topic_ids):
+            """Updates the list and the editor for topics that were changed behind their back (undo/redo), only these rows are reloaded"""
+            if self.list_selector.content == "topics":
+                for topic_id in topic_ids:
+                    topic = self.topic_service.get(topic_id)
+                    if topic is None:
+                        self.list_selector.remove_item(topic_id)
+                    elif topic_id in self.list_selector.entries:
+                        self.list_selector.rename_item(topic_id, topic.title)
+                    else:
+                        self.list_selector.add_item(topic_id, topic.title)
+                for topic_id in assignment_topic_ids:
+                    self.list_selector.set_assignments(topic_id, self.topic_service.get_assignments(topic_id))
+            
+            shown = self.editing_block.db_id
+            if self.editing_block.content_type == "topics" and shown in (set(topic_ids) | set(assignment_topic_ids)):
+                if self.topic_service.get(shown) is not None:
+                    self.editing_block.load_item_content(shown, "topics")
+        
         def update_editing_block_fields(self, db_id):
             """"Called when a button on the list is pressed"""
             if self.current_data_type:
@@ -425,8 +777,9 @@ class ContentManagerApp(App):
         
         topic_service = TopicService(db)
         category_service = CategoryService(db)
+        journal = ChangeJournal(db)
 
-        window = ContentManager(topic_service, category_service)
+        window = ContentManager(topic_service, category_service, journal)
 
         return window
 
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from datetime import date
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Guest:
     """Guest data class"""
     id: int | None #set to none to not bother with it on creation but enable the option for later 
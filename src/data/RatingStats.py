@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import Dict
+
+@dataclass(frozen=True, slots=True)
+class RatingStats:
+    """Rating distribution of a group of guests, e.g. one day or one institution. Guests without a valid rating are not counted"""
+    distribution: Dict[int, int] = field(default_factory=dict) #rating (0-5) -> number of guests
+    
+    @property
+    def count(self) -> int:
+        return sum(self.distribution.values())
+    
+    @property
+    def average(self) -> float | None:
+        count = self.count
+        return sum(rating * amount for rating, amount in self.distribution.items()) / count if count else None
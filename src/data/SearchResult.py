@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    """Single hit of a ranked topic search"""
+    id: int
+    title: str
+    snippet: str #text around the best match, taken from the title or description
+    score: float #bm25, lower is better
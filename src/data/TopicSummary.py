@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True, slots=True)
+class TopicSummary:
+    """Just enough of a topic to show it in a list, the full topic is loaded once it gets opened"""
+    id: int
+    title: str
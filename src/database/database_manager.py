@@ -1,15 +1,56 @@
 import sqlite3
-from typing import Dict, Iterable
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+from database.migrations import MIGRATIONS
+from database.query_stats import QueryStats, InstrumentedCursor
+
+DEFAULT_DB_PATH = "./database/test.db" #use double \\ for windows, single / for linux
 
 
 class Manager:
-    """Please run the database availability function first before continuing as there will be issues without. Due to custom schemas being possible, this is not done automatically.""" 
+    """Please run the database availability function first before continuing as there will be issues without. Due to custom schemas being possible, this is not done automatically.
+    
+    By default a single connection is used, which only works from the thread that created the Manager.
+    With pooled=True every thread gets its own connection on first use (explorer: kivy, tlv reader, joystick, writer threads)."""
     
     
-    def __init__(self): 
-        db_path = "./database/test.db" #use double \\ for windows, single / for linux
-        self.__con = sqlite3.connect(db_path)
-        self.cur = self.__con.cursor()
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, pooled: bool = False, timeout: float = 5.0): 
+        self.db_path = db_path
+        self.pooled = pooled
+        self.timeout = timeout #seconds to wait for another writer before "database is locked" is raised
+        
+        self._local = threading.local() #holds the connection of each thread in pooled mode
+        self._connections = [] #every connection ever opened, so close() can get rid of all of them
+        self._lock = threading.Lock()
+        self.stats: QueryStats | None = None #see enable_stats
+        
+        if not pooled:
+            self._con = self._open_connection()
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=not self.pooled)
+        if self.db_path != ":memory:":
+            # WAL lets readers continue while another connection/process is writing
+            # synchronous=NORMAL is still safe in WAL mode and saves an fsync per commit on the SD card
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._connections.append(con)
+        return con
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection belonging to the calling thread (or the shared one if not pooled)"""
+        if not self.pooled:
+            return self._con
+        
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._open_connection()
+            self._local.con = con
+        return con
 
     def ensure_database_availability(self, tables:Dict[str,Dict[str, str]] = None ):
         """
@@ -17,10 +58,11 @@ class Manager:
         Table entries are supposed to look like: {"table name": {"column name": "value type (like TEXT)", ..}, ...} \n
         Note that the value type will be assigned to the variable, so choose sensibly. These can also contain things like NOT NULL and PRIMARY KEY\n
         Possible datatypes are: NULL, INTEGER, REAL, TEXT, BLOB
-        A default database scheme will be used alternatively.
+        A default database scheme will be used alternatively. Only the default scheme gets migrated to the newest version afterwards.
         """
         table_exists = []
-        if(tables==None):
+        default_schema = tables is None
+        if(default_schema):
             tables = {
                 "topics": { "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
                             "title" : "TEXT UNIQUE",
@@ -35,7 +77,7 @@ class Manager:
                             "name": "TEXT",
                             "institution": "TEXT",
                             "role" : "TEXT",
-                            "rating":"INTEGER",
+                            "purpose_of_visit":"TEXT", #holds the rating given on the guestbook screen
                             "date":"TEXT"},
                 "topicAssignment" : {   "id" : "INTEGER PRIMARY KEY AUTOINCREMENT",
                                         "topic_id": "INTEGER NOT NULL",
@@ -53,7 +95,7 @@ class Manager:
                 column_names += f"{column} {type},"
             column_names = column_names[:-1]  #removes the last comma
             try:
-                self.cur.execute(f"CREATE TABLE {table}({column_names})") #create the table with necessary columns
+                self._connection().execute(f"CREATE TABLE {table}({column_names})") #create the table with necessary columns
             except sqlite3.OperationalError as s: #if the table already exists, no need to make the program crash
                 if("already exists" in str(s)):
                     exists=True
@@ -64,36 +106,156 @@ class Manager:
         #notifying user if any table didn't exist beforehand
         if(False in table_exists):
             print("At least one table did not exist before initialization. Content or values will be missing and need to be corrected.")   
+        
+        if default_schema:
+            self.migrate()
         #now it is safe to assume that all necessary tables and columns are there
+    
+    def schema_version(self) -> int:
+        return self._connection().execute("PRAGMA user_version").fetchone()[0]
+    
+    def migrate(self, target: int | None = None) -> int:
+        """Applies all migrations newer than the databases user_version (up to target, if given), each one in its own transaction.
+        Unlike execute() this raises on errors, a half migrated database is worse than not starting at all. Returns the new version"""
+        con = self._connection()
+        if con.in_transaction:
+            con.commit()
+        
+        for migration in MIGRATIONS:
+            if target is not None and migration.version > target:
+                break
+            
+            con.execute("BEGIN IMMEDIATE") #takes the write lock right away, in case another process is migrating at the same time
+            try:
+                if migration.version <= con.execute("PRAGMA user_version").fetchone()[0]:
+                    con.rollback()
+                    continue
+                migration.apply(con)
+                con.execute(f"PRAGMA user_version={int(migration.version)}")
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+            print(f"Database migrated to version {migration.version}: {migration.description}")
+        
+        return self.schema_version()
+    
+    def load_copy(self, path: str):
+        """Overwrites this database with a copy of the database file at path, using the sqlite backup api"""
+        source = sqlite3.connect(path, timeout=self.timeout)
+        try:
+            source.backup(self._connection())
+        finally:
+            source.close()
+    
+    def explain(self, query: str, params: tuple = ()) -> List[str]:
+        """Returns the query plan sqlite chose for a query, one line per step. Useful to check if indexes are used"""
+        rows = self._connection().execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        return [detail for (_, _, _, detail) in rows]
 
     #here i want to define all functions myself, even though they just point at the builtin ones
     #this persues the goal of only this class handling the entirety of the database with no object access from other classes
     
     def commit_changes(self):
-        """commits changes inside the class instead of accessing the connection from outside the class"""
-        self.__con.commit()
+        """commits changes inside the class instead of accessing the connection from outside the class.
+        Inside of transaction() this does nothing, the outermost transaction commits everything at once"""
+        if self.in_transaction():
+            return
+        self._connection().commit()
     
+    def in_transaction(self) -> bool:
+        """True while the calling thread is inside a transaction() block"""
+        return getattr(self._local, "depth", 0) > 0
     
-    def execute(self, query:str, params: tuple | None = None) -> sqlite3.Cursor: #adding the return type just to clarify it's usage           
+    @contextmanager
+    def transaction(self):
+        """with db.transaction(): ... runs everything inside as one atomic unit with a single commit at the end.
+        Blocks can be nested, inner ones become savepoints. If an exception leaves a block, only that block's changes are rolled back.
+        Inside a transaction execute() raises errors instead of printing them, otherwise half of the changes would be committed"""
+        con = self._connection()
+        depth = getattr(self._local, "depth", 0)
+        savepoint = f"transaction_{depth}"
+        
+        if depth == 0:
+            if con.in_transaction:
+                con.commit() #changes made without transaction() that were never committed, they don't belong to this one
+            con.execute("BEGIN IMMEDIATE") #write lock right away instead of failing halfway through with "database is locked"
+        else:
+            con.execute(f"SAVEPOINT {savepoint}")
+        self._local.depth = depth + 1
+        
         try:
-            if params is not None:
-                # Only reject if ANY parameter is None
-                if all(p is not None for p in params):
-                    return self.cur.execute(query, params)
-                else:
-                    print(f"Rejected query due to None in parameters: {params}")
-                    return self.cur.execute(query)  # run without params
+            yield self
+        except BaseException:
+            if depth == 0:
+                con.rollback()
             else:
-                return self.cur.execute(query) #if they do, try executing without them
-            #this WILL throw an error, but better than overwriting with faulty data (None's)
+                con.execute(f"ROLLBACK TO {savepoint}")
+                con.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            if depth == 0:
+                con.commit()
+            else:
+                con.execute(f"RELEASE {savepoint}")
+        finally:
+            self._local.depth = depth
+    
+    
+    def execute(self, query:str, params: tuple | None = None) -> sqlite3.Cursor: #adding the return type just to clarify it's usage           
+        #every call gets its own cursor, otherwise a second query would reset the results of the first one
+        cur = self._connection().cursor()
+        if params is not None:
+            # Only reject if ANY parameter is None
+            if not all(p is not None for p in params):
+                print(f"Rejected query due to None in parameters: {params}")
+                params = None  # run without params
+                #this WILL throw an error, but better than overwriting with faulty data (None's)
+        
+        start = time.perf_counter()
+        try:
+            cur.execute(query, params) if params is not None else cur.execute(query)
         except Exception as e:
+            if self.stats:
+                self.stats.record_error(query)
+            if self.in_transaction():
+                raise #the transaction has to be rolled back as a whole
             print(f"Query execution failed due to: {str(e)}") #no need to have the entire database manager crash just because a query didn't execute correctly
+            return None
+        
+        if not self.stats:
+            return cur
+        elapsed = time.perf_counter() - start
+        plan = lambda: self.explain(query, params or ())
+        if cur.description is None: #writes are done at this point
+            self.stats.record(query, params, elapsed, cur.rowcount, plan)
+            return cur
+        return InstrumentedCursor(cur, self.stats, query, params, elapsed, plan) #reads also get timed while fetching
     
     def execute_many(self, query:str, data: Iterable) -> sqlite3.Cursor:
+        start = time.perf_counter()
         try:
-            return self.cur.executemany(query, data)
+            cur = self._connection().cursor().executemany(query, data)
         except Exception as e:
+            if self.stats:
+                self.stats.record_error(query)
+            if self.in_transaction():
+                raise
             print(f"Query execution failed due to: {str(e)}")
+            return None
+        if self.stats:
+            self.stats.record(query, None, time.perf_counter() - start, cur.rowcount)
+        return cur
+    
+    def enable_stats(self, stats: QueryStats | None = None, slow_ms: float = 50.0) -> QueryStats:
+        """Starts recording timings of all statements. Several managers can share one QueryStats object"""
+        self.stats = stats or QueryStats(slow_ms=slow_ms)
+        return self.stats
+    
+    def dump_stats(self, path: str):
+        """Writes the recorded statistics as json, see tools/query_stats.py to read them"""
+        if self.stats:
+            self.stats.dump(path)
         
     def fetch_one(self, object: sqlite3.Cursor):
         return object.fetchone()
@@ -104,5 +266,24 @@ class Manager:
     def fetchall(self, object: sqlite3.Cursor):
         return object.fetchall()
         
+    def close_thread_connection(self):
+        """Closes the connection of the calling thread. Only relevant in pooled mode, for threads that are about to end"""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            return
+        self._local.con = None
+        with self._lock:
+            self._connections.remove(con)
+        con.close()
+    
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for con in connections:
+            try:
+                con.close()
+            except sqlite3.ProgrammingError:
+                pass #connection belongs to another thread that is already gone
+        
     def __del__(self):
-        self.__con.close()
\ No newline at end of file
+        self.close()
\ No newline at end of file
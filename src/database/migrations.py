@@ -0,0 +1,210 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass
+class Migration:
+    """One step of the schema history. version is what PRAGMA user_version gets set to once apply() went through"""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _column_names(con: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in con.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _assignment_indexes(con: sqlite3.Connection):
+    # duplicates have to go before the unique index can be created, the oldest row of each pair is kept
+    con.execute("DELETE FROM topicAssignment WHERE id NOT IN (SELECT MIN(id) FROM topicAssignment GROUP BY topic_id, category_id)")
+    # unique pair, also covers get_assignments (topic_id -> category_id) without touching the table
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_assignment_topic_category ON topicAssignment (topic_id, category_id)")
+    # covers list_by_category (category_id -> topic_id)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_assignment_category_topic ON topicAssignment (category_id, topic_id)")
+
+
+def _guest_rating_column(con: sqlite3.Connection):
+    # the old default schema called the column "rating" while GuestService always wrote to purpose_of_visit
+    columns = _column_names(con, "guests")
+    if "purpose_of_visit" not in columns:
+        if "rating" in columns:
+            con.execute("ALTER TABLE guests RENAME COLUMN rating TO purpose_of_visit")
+        else:
+            con.execute("ALTER TABLE guests ADD COLUMN purpose_of_visit TEXT")
+
+
+def fts5_available(con: sqlite3.Connection) -> bool:
+    try:
+        con.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        con.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+# keep topics_fts in sync with topics. Also used by the importer, which drops them during large imports and rebuilds once
+TOPIC_SEARCH_TRIGGERS = {
+    "topics_fts_insert": """CREATE TRIGGER IF NOT EXISTS topics_fts_insert AFTER INSERT ON topics BEGIN
+                                INSERT INTO topics_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+                            END""",
+    "topics_fts_delete": """CREATE TRIGGER IF NOT EXISTS topics_fts_delete AFTER DELETE ON topics BEGIN
+                                INSERT INTO topics_fts (topics_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+                            END""",
+    "topics_fts_update": """CREATE TRIGGER IF NOT EXISTS topics_fts_update AFTER UPDATE OF id, title, description ON topics BEGIN
+                                INSERT INTO topics_fts (topics_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+                                INSERT INTO topics_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+                            END""",
+}
+
+
+def _topic_search_index(con: sqlite3.Connection):
+    if not fts5_available(con):
+        print("sqlite was built without FTS5, topic search will fall back to LIKE queries")
+        return
+    
+    # external content table: the text itself stays in topics, fts only keeps the index
+    con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS topics_fts USING fts5(title, description, content='topics', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+    for trigger in TOPIC_SEARCH_TRIGGERS.values():
+        con.execute(trigger)
+    con.execute("INSERT INTO topics_fts (topics_fts) VALUES ('rebuild')") #indexes all topics that existed before
+
+
+def _guest_date_index(con: sqlite3.Connection):
+    # date range queries (export, browsing by day). The dates are stored as text in str(datetime) format, which sorts chronologically
+    con.execute("CREATE INDEX IF NOT EXISTS idx_guests_date ON guests (date)")
+
+
+def _rating(row: str) -> str:
+    """sql for the rating of a guests row (new/old in triggers) as integer 0-5, NULL if it isn't one.
+    The slider stores floats, so '4.0' is as valid as '4'"""
+    return f"CASE WHEN trim({row}.purpose_of_visit) GLOB '[0-5]' OR trim({row}.purpose_of_visit) GLOB '[0-5].0' THEN CAST(trim({row}.purpose_of_visit) AS INTEGER) END"
+
+
+# dimension -> sql for the value a guest row is counted under
+_RATING_DIMENSIONS = {
+    "all": "''",
+    "day": "COALESCE(substr({row}.date, 1, 10), '')",
+    "institution": "COALESCE({row}.institution, '')",
+    "role": "COALESCE({row}.role, '')",
+}
+
+
+def _rating_dimensions(row: str) -> str:
+    """one (dimension, value, rating) row per dimension a guest is counted in"""
+    return " UNION ALL ".join(f"SELECT '{dimension}' AS dimension, {value.format(row=row)} AS value, {_rating(row)} AS rating"
+                              for dimension, value in _RATING_DIMENSIONS.items())
+
+
+def _guest_rating_counts(con: sqlite3.Connection):
+    # counts per rating, kept up to date by triggers so statistics never have to read the guests table
+    con.execute("""CREATE TABLE IF NOT EXISTS guest_rating_counts (dimension TEXT NOT NULL, value TEXT NOT NULL, rating INTEGER NOT NULL, count INTEGER NOT NULL,
+                   PRIMARY KEY (dimension, value, rating)) WITHOUT ROWID""")
+    add = f"""INSERT INTO guest_rating_counts (dimension, value, rating, count)
+                  SELECT dimension, value, rating, 1 FROM ({_rating_dimensions('new')}) WHERE rating IS NOT NULL
+                  ON CONFLICT (dimension, value, rating) DO UPDATE SET count = count + 1;"""
+    remove = f"""UPDATE guest_rating_counts SET count = count - 1
+                     WHERE (dimension, value, rating) IN (SELECT dimension, value, rating FROM ({_rating_dimensions('old')}) WHERE rating IS NOT NULL);
+                 DELETE FROM guest_rating_counts WHERE count <= 0;"""
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS guest_rating_counts_insert AFTER INSERT ON guests BEGIN {add} END")
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS guest_rating_counts_delete AFTER DELETE ON guests BEGIN {remove} END")
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS guest_rating_counts_update AFTER UPDATE OF purpose_of_visit, date, institution, role ON guests BEGIN {remove} {add} END")
+    
+    con.execute("DELETE FROM guest_rating_counts")
+    for dimension, value in _RATING_DIMENSIONS.items(): #guests that existed before
+        con.execute(f"""INSERT INTO guest_rating_counts (dimension, value, rating, count)
+                        SELECT '{dimension}', {value.format(row='g')} AS value, {_rating('g')} AS rating, COUNT(*) FROM guests AS g
+                        WHERE rating IS NOT NULL GROUP BY value, rating""")
+
+
+def _usage_events(con: sqlite3.Connection):
+    # append only log written by UsageTracker. event is "view", "category" or "dwell", seconds is only set for dwell times
+    con.execute("""CREATE TABLE IF NOT EXISTS usage_events (id INTEGER PRIMARY KEY, time TEXT NOT NULL, event TEXT NOT NULL,
+                   topic_id INTEGER, category_id INTEGER, seconds REAL)""")
+    
+    # the explorer's in-memory mirror reloads when the file changes. Guest entries and usage events change it all the time,
+    # so this counter only moves when the content the explorer shows changes
+    con.execute("CREATE TABLE IF NOT EXISTS content_version (version INTEGER NOT NULL)")
+    if con.execute("SELECT COUNT(*) FROM content_version").fetchone()[0] == 0:
+        con.execute("INSERT INTO content_version (version) VALUES (0)")
+    for table in ("topics", "categories", "topicAssignment"):
+        for action in ("INSERT", "UPDATE", "DELETE"):
+            con.execute(f"""CREATE TRIGGER IF NOT EXISTS content_version_{table}_{action.lower()} AFTER {action} ON {table} BEGIN
+                                UPDATE content_version SET version = version + 1;
+                            END""")
+
+
+def _topic_view_days(con: sqlite3.Connection):
+    # views per topic and day, kept up to date from usage_events. Popularity is computed from these instead of the raw events
+    con.execute("""CREATE TABLE IF NOT EXISTS topic_view_days (day TEXT NOT NULL, topic_id INTEGER NOT NULL, views INTEGER NOT NULL,
+                   PRIMARY KEY (day, topic_id)) WITHOUT ROWID""")
+    con.execute("""CREATE TRIGGER IF NOT EXISTS topic_view_days_insert AFTER INSERT ON usage_events
+                   WHEN new.event = 'view' AND new.topic_id IS NOT NULL BEGIN
+                       INSERT INTO topic_view_days (day, topic_id, views) VALUES (substr(new.time, 1, 10), new.topic_id, 1)
+                       ON CONFLICT (day, topic_id) DO UPDATE SET views = views + 1;
+                   END""")
+    con.execute("DELETE FROM topic_view_days")
+    con.execute("""INSERT INTO topic_view_days (day, topic_id, views)
+                   SELECT substr(time, 1, 10), topic_id, COUNT(*) FROM usage_events
+                   WHERE event = 'view' AND topic_id IS NOT NULL GROUP BY 1, 2""") #views logged before
+
+
+# rows of these tables get journaled while ChangeJournal records a batch, with these columns (id first)
+JOURNALED_TABLES = {
+    "topics": ("id", "title", "description", "source"),
+    "topicAssignment": ("id", "topic_id", "category_id"),
+}
+
+
+def _change_journal(con: sqlite3.Connection):
+    # before/after image of every changed row as json, NULL before an insert and after a delete. Only the rows a batch touched are stored
+    con.execute("""CREATE TABLE IF NOT EXISTS change_batches (id INTEGER PRIMARY KEY, label TEXT, time TEXT NOT NULL, undone INTEGER NOT NULL DEFAULT 0)""")
+    con.execute("""CREATE TABLE IF NOT EXISTS change_journal (id INTEGER PRIMARY KEY, batch INTEGER NOT NULL, tbl TEXT NOT NULL, row_id INTEGER NOT NULL,
+                   before TEXT, after TEXT)""")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_change_journal_batch ON change_journal (batch)")
+    
+    # batch is only set inside the transaction of a recorded edit and reset before its commit,
+    # so changes by other connections (importer, config tool) and by undo/redo itself are never journaled
+    con.execute("CREATE TABLE IF NOT EXISTS journal_state (batch INTEGER)")
+    if con.execute("SELECT COUNT(*) FROM journal_state").fetchone()[0] == 0:
+        con.execute("INSERT INTO journal_state (batch) VALUES (NULL)")
+    
+    for table, columns in JOURNALED_TABLES.items():
+        image = {row: "json_object(" + ", ".join(f"'{column}', {row}.{column}" for column in columns) + ")" for row in ("old", "new")}
+        for action, row_id, before, after in (("INSERT", "new.id", "NULL", image["new"]),
+                                              ("UPDATE", "new.id", image["old"], image["new"]),
+                                              ("DELETE", "old.id", image["old"], "NULL")):
+            unchanged = f" AND {before} IS NOT {after}" if action == "UPDATE" else "" #updates that wrote the same values
+            con.execute(f"""CREATE TRIGGER IF NOT EXISTS change_journal_{table}_{action.lower()} AFTER {action} ON {table}
+                            WHEN (SELECT batch FROM journal_state) IS NOT NULL{unchanged} BEGIN
+                                INSERT INTO change_journal (batch, tbl, row_id, before, after)
+                                VALUES ((SELECT batch FROM journal_state), '{table}', {row_id}, {before}, {after});
+                            END""")
+
+
+def _guest_browse_indexes(con: sqlite3.Connection):
+    # guestbook browser: name search (prefix, any case) and institution filter, both paged with keysets
+    con.execute("CREATE INDEX IF NOT EXISTS idx_guests_name ON guests (name COLLATE NOCASE)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_guests_institution_date ON guests (institution COLLATE NOCASE, date)")
+
+
+def _guest_rating_triggers(con: sqlite3.Connection):
+    # version 5 counted days as substr(date, 1, 10), which is NULL for guests without a date and made their inserts fail
+    for action in ("insert", "delete", "update"):
+        con.execute(f"DROP TRIGGER IF EXISTS guest_rating_counts_{action}")
+    _guest_rating_counts(con)
+
+
+# append only! existing kiosk databases rely on the version numbers staying the same
+MIGRATIONS: List[Migration] = [
+    Migration(1, "unique topic/category pairs and covering indexes for assignments", _assignment_indexes),
+    Migration(2, "guests.purpose_of_visit for databases created with the old default schema", _guest_rating_column),
+    Migration(3, "full text search index over topic titles and descriptions", _topic_search_index),
+    Migration(4, "index for date ranges of guest entries", _guest_date_index),
+    Migration(5, "trigger maintained rating counts per day, institution and role", _guest_rating_counts),
+    Migration(6, "usage event log and a version counter for the explorer content", _usage_events),
+    Migration(7, "daily view counters per topic for popularity ranking", _topic_view_days),
+    Migration(8, "row level change journal for undo/redo in the content manager", _change_journal),
+    Migration(9, "indexes for searching guests by name and institution", _guest_browse_indexes),
+    Migration(10, "rating counts for guests without a date", _guest_rating_triggers),
+]
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Tuple
+
+from database.database_manager import Manager, DEFAULT_DB_PATH
+
+
+class MirrorManager(Manager):
+    """Read-only in-memory copy of a database file, made with the sqlite backup api.
+    Queries never touch the file after loading. A watcher thread (see start_watching) checks the file's
+    modification time and loads a fresh copy when another process (content manager, config tool) changed it.
+    Writes are refused, use a regular Manager on the file for those.
+    Databases with a content_version table (migration 6) only get reloaded when topics, categories or assignments changed,
+    not for every guest entry or usage event."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, timeout: float = 5.0):
+        self.source_path = db_path
+        self._signature = None
+        self._version = None #content_version of the loaded copy
+        self._reload_listeners: List[Callable[[], None]] = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        super().__init__(":memory:", pooled=False, timeout=timeout)
+
+    def _open_connection(self) -> sqlite3.Connection:
+        # may be opened by the watcher thread and then used by the ui thread
+        con = sqlite3.connect(":memory:", check_same_thread=False)
+        self._signature = self._file_signature()
+        source = sqlite3.connect(self.source_path, timeout=self.timeout)
+        try:
+            source.backup(con)
+        finally:
+            source.close()
+        con.execute("PRAGMA query_only=ON")
+        self._version = self._read_version(con)
+        with self._lock:
+            self._connections.append(con)
+        return con
+
+    def _file_signature(self) -> Tuple:
+        """mtime and size of the database and its WAL file, committed changes show up in at least one of them"""
+        signature = []
+        for path in (self.source_path, self.source_path + "-wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @staticmethod
+    def _read_version(con: sqlite3.Connection) -> int | None:
+        try:
+            return con.execute("SELECT version FROM content_version").fetchone()[0]
+        except (sqlite3.Error, TypeError): #not migrated yet
+            return None
+    
+    def _version_on_disk(self) -> int | None:
+        try:
+            con = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True, timeout=self.timeout)
+        except sqlite3.Error:
+            return None
+        try:
+            return self._read_version(con)
+        finally:
+            con.close()
+    
+    def add_reload_listener(self, callback: Callable[[], None]):
+        """callback() gets called after a new copy was loaded. Runs on the watcher thread!"""
+        self._reload_listeners.append(callback)
+
+    def changed_on_disk(self) -> bool:
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        # the file changed, but maybe only in tables the explorer doesn't read
+        if self._version is not None and self._version_on_disk() == self._version:
+            self._signature = signature
+            return False
+        return True
+
+    def reload(self):
+        """Loads a fresh copy of the file and swaps it in. Cursors of the old copy stay valid until they are garbage collected"""
+        new_con = self._open_connection()
+        with self._lock:
+            old_con, self._con = self._con, new_con
+            self._connections.remove(old_con) #not closed here, a query on the ui thread might still be reading from it
+        for callback in self._reload_listeners:
+            callback()
+
+    def start_watching(self, interval: float = 5.0):
+        if self._thread: return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name="Mirror Watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        self._stop_event.set()
+        self._thread = None
+
+    def _watch(self, interval: float):
+        while not self._stop_event.wait(interval):
+            try:
+                if self.changed_on_disk():
+                    self.reload()
+            except sqlite3.Error as e: #e.g. locked for longer than the timeout, the next round tries again
+                print(f"Reloading the database mirror failed: {e}")
+
+    def migrate(self, target: int | None = None) -> int:
+        raise sqlite3.OperationalError("The mirror is read-only, migrate the database file with a regular Manager")
@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, List
+
+
+# upper bounds of the latency histogram buckets in ms, the last one catches everything above
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, float("inf"))
+
+
+def normalize_sql(query: str) -> str:
+    """Groups queries that only differ in formatting, literals or the length of IN (?,?,..) lists"""
+    query = re.sub(r"'(?:[^']|'')*'", "?", query) #string literals
+    query = re.sub(r"\b\d+(\.\d+)?\b", "?", query) #number literals
+    query = re.sub(r"\(\s*\?(\s*,\s*\?)*\s*\)", "(?...)", query)
+    return " ".join(query.split())
+
+
+class QueryStats:
+    """Collects timings of every statement run through a Manager: count, total/max time, rows and a latency histogram per
+    normalized statement, plus a log of slow queries with the query plan sqlite used for them."""
+
+    def __init__(self, slow_ms: float = 50.0, slow_log_size: int = 200):
+        self.slow_ms = slow_ms
+        self.started = time.time()
+        self._statements = {}
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def record(self, query: str, params, elapsed: float, rows: int, plan: Callable[[], List[str]] | None = None):
+        """elapsed in seconds. plan is only called (once per statement) if the query was slow"""
+        ms = elapsed * 1000
+        key = normalize_sql(query)
+        with self._lock:
+            entry = self._entry(key)
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["rows"] += max(rows, 0)
+            entry["histogram"][bisect_left(BUCKETS_MS, ms)] += 1
+            slow = ms >= self.slow_ms
+            need_plan = slow and entry["plan"] is None and plan is not None
+
+        if not slow:
+            return
+        if need_plan:
+            try:
+                entry["plan"] = plan()
+            except Exception as e: #e.g. statements that can't be explained
+                entry["plan"] = [f"unavailable: {e}"]
+        with self._lock:
+            self._slow_log.append({"time": time.time(),
+                                   "sql": key,
+                                   "params": repr(params)[:200],
+                                   "ms": round(ms, 3),
+                                   "rows": rows,
+                                   "plan": entry["plan"]})
+
+    def record_error(self, query: str):
+        with self._lock:
+            self._entry(normalize_sql(query))["errors"] += 1
+
+    def _entry(self, key: str) -> dict:
+        entry = self._statements.get(key)
+        if entry is None:
+            entry = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "errors": 0,
+                     "histogram": [0] * len(BUCKETS_MS), "plan": None}
+            self._statements[key] = entry
+        return entry
+
+    def snapshot(self) -> dict:
+        """Everything collected so far, statements sorted by total time spent"""
+        with self._lock:
+            statements = []
+            for sql, entry in self._statements.items():
+                statements.append({"sql": sql,
+                                   **entry,
+                                   "histogram": dict(zip([str(bucket) for bucket in BUCKETS_MS], entry["histogram"])),
+                                   "avg_ms": entry["total_ms"] / entry["count"] if entry["count"] else 0.0})
+            statements.sort(key=lambda s: s["total_ms"], reverse=True)
+            return {"started": self.started,
+                    "slow_ms": self.slow_ms,
+                    "statements": statements,
+                    "slow_queries": list(self._slow_log)}
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._statements.clear()
+            self._slow_log.clear()
+
+
+class InstrumentedCursor:
+    """Wraps a cursor to time the fetch calls as well, sqlite does most of the work there and not in execute.
+    The statement is recorded once all rows the caller wanted are fetched. Everything else is passed to the real cursor"""
+
+    def __init__(self, cursor, stats: QueryStats, query: str, params, elapsed: float, plan):
+        self._cursor = cursor
+        self._stats = stats
+        self._query = query
+        self._params = params
+        self._elapsed = elapsed
+        self._rows = 0
+        self._plan = plan
+        self._recorded = False
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._elapsed += time.perf_counter() - start
+        return result
+
+    def _finish(self, explain: bool = True):
+        """explain=False records without a query plan, for calls that may run on any thread"""
+        if not self._recorded:
+            self._recorded = True
+            rows = self._rows if self._cursor.description is not None else self._cursor.rowcount #writes don't return rows
+            self._stats.record(self._query, self._params, self._elapsed, rows, self._plan if explain else None)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        self._rows += row is not None
+        self._finish()
+        return row
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def fetchmany(self, size: int | None = None):
+        rows = self._timed(self._cursor.fetchmany, *(() if size is None else (size,)))
+        self._rows += len(rows)
+        if not rows or (size is not None and len(rows) < size):
+            self._finish() #nothing left
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self._timed(self._cursor.fetchone)
+            if row is None:
+                self._finish()
+                return
+            self._rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        # caller stopped fetching early (or never did, e.g. for writes). The garbage collector can run this on any thread,
+        # explaining from here would open a new connection there with a pooled Manager. The plan gets captured by a later slow run
+        self._finish(explain=False)
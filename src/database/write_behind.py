@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+from typing import Iterable
+
+from database.database_manager import Manager
+
+
+class WriteBehindQueue:
+    """Collects rows for a single INSERT statement and writes them from a background thread, several rows per commit.
+    Requires a pooled Manager, as the writer thread uses its own connection.
+    If maxlen is set the queue behaves like a ring buffer and drops the oldest rows once full instead of blocking.
+    A batch that fails (e.g. "database is locked" while another process writes) goes back to the front of the queue and is retried later,
+    waiting a bit longer after each failure, up to max_backoff seconds."""
+
+    def __init__(self, db: Manager, query: str, batch_size: int = 50, interval: float = 0.5, maxlen: int | None = None, name: str = "Write Behind", max_backoff: float = 30.0):
+        self.db = db
+        self.query = query
+        self.batch_size = batch_size
+        self.interval = interval #seconds between writes if the batch doesn't fill up earlier
+        self.name = name
+        self.max_backoff = max_backoff
+
+        self._rows = deque(maxlen=maxlen)
+        self._in_flight = 0 #rows taken from the queue but not committed yet
+        self._flush_requested = False #write everything without waiting for the interval
+        self._failures = 0 #failed writes in a row, for the backoff
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread: return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def put(self, row: tuple):
+        with self._cond:
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+
+    def put_many(self, rows: Iterable[tuple]):
+        with self._cond:
+            self._rows.extend(rows)
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        """Amount of rows that have not been committed yet"""
+        with self._cond:
+            return len(self._rows) + self._in_flight
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Blocks until everything queued so far is committed. Returns False if the timeout ran out first"""
+        if not self._thread:
+            return self._write_pending() #nothing running in the background, so just write everything right here
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._rows or self._in_flight:
+                self._flush_requested = True
+                self._cond.notify_all() #don't wait for the interval to pass
+            while self._rows or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float | None = 5.0) -> bool:
+        """Writes all remaining rows and ends the writer thread. Returns False if rows were still pending on timeout"""
+        flushed = self.flush(timeout)
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        return flushed
+
+    def _take_batch(self) -> list:
+        """Needs to be called while holding the condition"""
+        batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+        self._in_flight = len(batch)
+        return batch
+
+    def _write(self, batch: list) -> bool:
+        """Writes the batch in one transaction. If that fails the rows are put back in front of the queue and False is returned"""
+        written = False
+        try:
+            with self.db.transaction(): #errors are raised in here instead of just printed
+                self.db.execute_many(self.query, batch)
+            written = True
+        except Exception as e:
+            print(f"{self.name} failed to write {len(batch)} rows, trying again later: {e}")
+        finally:
+            with self._cond:
+                if not written:
+                    self._rows.extendleft(reversed(batch)) #same order as before. A full ring buffer drops the newest rows here
+                self._failures = 0 if written else self._failures + 1
+                if written and not self._rows:
+                    self._flush_requested = False #drained, back to writing every interval
+                self._in_flight = 0
+                self._cond.notify_all()
+        return written
+
+    def _write_pending(self) -> bool:
+        """Writes everything queued. Stops at the first failed batch and returns False, its rows stay queued"""
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return True
+            if not self._write(batch):
+                return False
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                if len(self._rows) < self.batch_size and not self._flush_requested:
+                    self._cond.wait(self.interval)
+                batch = self._take_batch()
+                if not batch:
+                    self._flush_requested = False #nothing to drain, a flag left set would keep this loop from waiting
+
+            if batch and not self._write(batch):
+                # the database is probably locked by another writer, give it some time
+                self._stop_event.wait(min(self.interval * 2 ** (self._failures - 1), self.max_backoff))
+
+        self._write_pending() #anything that got queued while stopping
+        self.db.close_thread_connection()
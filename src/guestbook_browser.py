@@ -7,8 +7,14 @@ from kivy.graphics import Color, Rectangle
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
+from kivy.uix.textinput import TextInput
+from kivy.uix.spinner import Spinner
+from kivy.clock import Clock
+
+from datetime import date, timedelta
 
 from database.database_manager import Manager
+from data.RatingStats import RatingStats
 from services.GuestService import GuestService
 
 from ui.SelectableButton import SelectableButton 
@@ -22,7 +28,9 @@ class CMSelectableButton(SelectableButton):
             cm.update_text_block_fields(self.db_id)
 
 class ListSelector(RecycleView):
-    """"The selection list used to select different topic/category items"""
+    """"The selection list used to select different topic/category items. Guests are loaded a page at a time while scrolling down"""
+    PAGE_SIZE = 100
+    
     def __init__(self, gs: GuestService, **kwargs):
         super().__init__(**kwargs)
         self.guest_service =gs
@@ -43,9 +51,89 @@ class ListSelector(RecycleView):
         self.add_widget(recycle_layout)
         self.viewclass='CMSelectableButton'
         
-        guests = self.guest_service.list()
-        self.data=[{'text' : f"{guest.id} {guest.name}", 'db_id': guest.id} for guest in guests]
-        self.refresh_from_data()
+        self.filters={} #keyword arguments for GuestService.list_page
+        self._last=None #last guest loaded, the next page starts after it
+        self._exhausted=False
+        self.bind(scroll_y=self.on_scroll)
+        self.set_filters()
+    
+    def set_filters(self, **filters):
+        """name, institution, since, until like GuestService.list_page. Starts over with the first page"""
+        self.filters=filters
+        self._last=None
+        self._exhausted=False
+        self.data=[]
+        self.load_more()
+        self.scroll_y=1
+    
+    def load_more(self):
+        if self._exhausted:
+            return
+        page = self.guest_service.list_page(self._last, self.PAGE_SIZE, **self.filters)
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted=True
+        if page:
+            self._last=page[-1]
+            self.data.extend({'text' : f"{guest.id} {guest.name}", 'db_id': guest.id} for guest in page)
+    
+    def on_scroll(self, _, scroll_y):
+        if scroll_y <= 0.1: #scroll_y is 0 at the bottom
+            self.load_more()
+
+
+class FilterBar(GridLayout):
+    """Search by name, institution and date range. Typing waits a moment before the list gets reloaded"""
+    ALL_INSTITUTIONS = "All institutions"
+    
+    def __init__(self, gs: GuestService, on_change, **kwargs):
+        super().__init__(**kwargs)
+        self.cols=2
+        self.rows=2
+        self.spacing=dp(5)
+        self.guest_service=gs
+        self.on_change=on_change #gets the filters as keyword arguments
+        
+        self.name_input=TextInput(hint_text="Name", multiline=False, font_size="16sp")
+        self.institution_spinner=Spinner(text=self.ALL_INSTITUTIONS, font_size="16sp")
+        self.since_input=TextInput(hint_text="From YYYY-MM-DD", multiline=False, font_size="16sp")
+        self.until_input=TextInput(hint_text="To YYYY-MM-DD", multiline=False, font_size="16sp")
+        self.refresh_institutions()
+        
+        for widget in (self.name_input, self.institution_spinner, self.since_input, self.until_input):
+            widget.bind(text=self.schedule_change)
+            self.add_widget(widget)
+        
+        self._pending=Clock.create_trigger(self.apply, 0.3)
+    
+    def refresh_institutions(self):
+        institutions=self.guest_service.institutions()
+        self.institution_spinner.values=[self.ALL_INSTITUTIONS]+[institution for institution in institutions if institution]
+    
+    def schedule_change(self, *_):
+        self._pending() #restarts the delay on every key press
+    
+    def apply(self, *_):
+        institution=self.institution_spinner.text
+        filters={"name": self.name_input.text.strip(),
+                 "institution": "" if institution == self.ALL_INSTITUTIONS else institution}
+        since=self._parse_date(self.since_input)
+        until=self._parse_date(self.until_input)
+        if since:
+            filters["since"]=since
+        if until:
+            filters["until"]=until + timedelta(days=1) #the day typed in is included
+        self.on_change(**filters)
+    
+    @staticmethod
+    def _parse_date(text_input: TextInput) -> date | None:
+        """Invalid dates are ignored, the input turns red until it's fixed"""
+        text=text_input.text.strip()
+        try:
+            value=date.fromisoformat(text) if text else None
+        except ValueError:
+            value=None
+        text_input.background_color=(1, 0.8, 0.8, 1) if text and value is None else (1, 1, 1, 1)
+        return value
         
 
 class TextBlock(GridLayout):
@@ -67,20 +155,31 @@ class TextBlock(GridLayout):
 
         self.bind(pos=self.update_bg, size=self.update_bg)
         
+        # created once, loading a guest only changes their text
+        self.value_labels = {}
+        for key in ("Name:", "Institution:", "Role:", "Rating:", "Date:"):
+            # Left label (key) - right aligned
+            left_label = Label(text=key, font_size="20sp", color=(0,0,0,1), halign='right', valign='middle')
+            left_label.bind(size=lambda label, size: setattr(label, 'text_size', size))
+            self.add_widget(left_label)
+            
+            # Right label (value) - left aligned
+            right_label = Label(text="", font_size="20sp", color=(0,0,0,1), halign='left', valign='middle')
+            right_label.bind(size=lambda label, size: setattr(label, 'text_size', size))
+            self.add_widget(right_label)
+            self.value_labels[key] = right_label
+        
         self.load_item_content(-1)
                  
         
     def load_item_content(self, item_id):
         """Loads content for given item_id and type"""
-        self.clear_widgets()
-        
-        if(item_id>=0):                                           
-            guest = self.guest_service.get_for_id(item_id)
-        else:
-            guest = ("","","","","","") #just for init
-            
+        guest = self.guest_service.get_for_id(item_id) if item_id >= 0 else None
+        if guest is None:
+            guest = ("","","","","","") #just for init, or the guest was deleted meanwhile
             
         _,name,inst,role,rate,date = guest
+        rate = "" if rate is None else str(rate)
         
         guest = {"Name:": name,
                  "Institution:": inst,
@@ -88,16 +187,8 @@ class TextBlock(GridLayout):
                  "Rating:": rate + "%s"%("/5" if rate else""), 
                  "Date:": date}
         
-        for key in guest.keys():
-            # Left label (key) - right aligned
-            left_label = Label(text=key, font_size="20sp", color=(0,0,0,1), halign='right', valign='middle')
-            left_label.bind(size=lambda label, size: setattr(label, 'text_size', size))
-            self.add_widget(left_label)
-            
-            # Right label (value) - left aligned
-            right_label = Label(text=guest.get(key), font_size="20sp", color=(0,0,0,1), halign='left', valign='middle')
-            right_label.bind(size=lambda label, size: setattr(label, 'text_size', size))
-            self.add_widget(right_label)
+        for key, value in guest.items():
+            self.value_labels[key].text = str(value or "")
             
     def update_bg(self, instance, _):
         self.bg_rect.pos = instance.pos
@@ -105,6 +196,47 @@ class TextBlock(GridLayout):
             
 
 
+class RatingSummary(BoxLayout):
+    """Rating statistics, read from the aggregated counters only, so it stays fast no matter how many guests there are"""
+    
+    def __init__(self, gs: GuestService, **kwargs):
+        super().__init__(**kwargs)
+        
+        self.orientation="vertical"
+        self.padding=dp(10)
+        self.guest_service=gs
+        
+        with self.canvas.before:
+            Color(rgba=(0.85, 0.85, 0.85, 1))
+            self.bg_rect = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self.update_bg, size=self.update_bg)
+        
+        self.label=Label(font_size="16sp", color=(0,0,0,1), halign='left', valign='top')
+        self.label.bind(size=lambda label, size: setattr(label, 'text_size', size))
+        self.add_widget(self.label)
+        
+        self.refresh()
+    
+    @staticmethod
+    def format_stats(title: str, stats: RatingStats) -> str:
+        if not stats.count:
+            return f"{title}: no ratings"
+        bars = "   ".join(f"{rating}: {stats.distribution.get(rating, 0)}" for rating in range(6))
+        return f"{title}: {stats.count} ratings, average {stats.average:.2f}/5\n    {bars}"
+    
+    def refresh(self):
+        today = date.today()
+        lines = [self.format_stats("All time", self.guest_service.rating_total()),
+                 self.format_stats("Last 7 days", self.guest_service.rating_total(today - timedelta(days=6), today + timedelta(days=1)))]
+        for role, stats in sorted(self.guest_service.rating_stats("role").items()):
+            lines.append(self.format_stats(f"Role '{role or '-'}'", stats))
+        self.label.text = "\n".join(lines)
+    
+    def update_bg(self, instance, _):
+        self.bg_rect.pos = instance.pos
+        self.bg_rect.size = instance.size
+
+
 #--Main window stuff
 
 class Guestbook(BoxLayout):
@@ -115,11 +247,20 @@ class Guestbook(BoxLayout):
             self.guest_service=gs
             self.orientation="horizontal"
 
-            self.list_selector = ListSelector(size_hint=(0.4, 0.9), gs=self.guest_service)
-            self.add_widget(self.list_selector)
+            left_side = BoxLayout(orientation="vertical", size_hint=(0.4, 0.9), spacing=dp(10))
+            self.list_selector = ListSelector(size_hint=(1, 0.86), gs=self.guest_service)
+            self.filter_bar = FilterBar(size_hint=(1, 0.14), gs=self.guest_service, on_change=self.list_selector.set_filters)
+            left_side.add_widget(self.filter_bar)
+            left_side.add_widget(self.list_selector)
+            self.add_widget(left_side)
+            
+            right_side = BoxLayout(orientation="vertical", size_hint=(0.6, 0.9), spacing=dp(10))
+            self.text_block = TextBlock(size_hint=(1, 0.6), gs=self.guest_service)
+            right_side.add_widget(self.text_block)
             
-            self.text_block = TextBlock(size_hint=(0.6, 0.9), gs=self.guest_service)
-            self.add_widget(self.text_block)
+            self.rating_summary = RatingSummary(size_hint=(1, 0.4), gs=self.guest_service)
+            right_side.add_widget(self.rating_summary)
+            self.add_widget(right_side)
                       
             
         def update_text_block_fields(self, db_id):
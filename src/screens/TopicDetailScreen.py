@@ -7,6 +7,7 @@ from kivy.properties import NumericProperty
 from kivy.graphics.texture import Texture
 
 from hardware.JoystickManager import Joystick, Intent
+from services.UsageTracker import UsageTracker
 from ui.HoverableButton import HoverableButton
 
 import qrcode
@@ -16,14 +17,17 @@ from kivy.uix.image import Image as kiImage
 from io import BytesIO
 
 from kivy.clock import Clock
+import time
 
 class TopicDetailScreen(Screen):
     db_id = NumericProperty(None) #to be used for tracking/usage history
     
-    def __init__(self, js:Joystick, **kwargs):
+    def __init__(self, js:Joystick, usage: UsageTracker | None = None, **kwargs):
         super().__init__(**kwargs)
 
         self.js=js
+        self.usage=usage
+        self.shown_since=None
 
         # Main container
         main_layout = BoxLayout(
@@ -102,6 +106,14 @@ class TopicDetailScreen(Screen):
         if self.js:
             Clock.schedule_interval(self.check_joystick_events, 0.1)
 
+    def on_enter(self):
+        self.shown_since=time.monotonic()
+    
+    def on_pre_leave(self):
+        if self.usage and self.shown_since is not None and self.db_id is not None:
+            self.usage.dwell(int(self.db_id), time.monotonic()-self.shown_since)
+        self.shown_since=None
+    
     def go_back(self, *_):
         self.manager.transition = SlideTransition(direction="left")
         self.manager.current = 'topic_list'
@@ -11,6 +11,9 @@ from typing import List
 
 from services.TopicService import TopicService
 from services.CategoryService import CategoryService
+from services.TitleIndex import TitleIndex
+from services.UsageTracker import UsageTracker
+from services.PopularityRanker import PopularityRanker
 from data.Topic import Topic
 from hardware.JoystickManager import Joystick, Intent
 
@@ -22,10 +25,15 @@ from kivy.clock import Clock
 
 
 class TopicListScreen(Screen):
-    def __init__(self, ts:TopicService, cs:CategoryService, js:Joystick, **kwargs):
+    PAGE_SIZE = 50 #topics loaded per query, more get loaded once the user gets close to the end of the list
+    
+    def __init__(self, ts:TopicService, cs:CategoryService, js:Joystick, usage: UsageTracker | None = None, ranker: PopularityRanker | None = None, **kwargs):
+        """With a ranker, category lists show the most viewed topics first instead of sorting by id"""
         super().__init__(**kwargs)
 
         self.js=js
+        self.usage=usage
+        self.ranker=ranker
         self.ts=ts
         self.cs=cs
         
@@ -33,6 +41,13 @@ class TopicListScreen(Screen):
         
         self.current_category=None
         
+        self._paging_category=None #category whose list is shown and may have more pages, None while showing search results
+        self._last_id=0
+        self._exhausted=True
+        self._ranked=None #whole category sorted by popularity, pages are taken from here instead of the database
+        
+        self.title_index=TitleIndex().attach(self.ts) #in memory, so typing doesn't hit the database
+        
         main_layout = FloatLayout()
         
         # Set background
@@ -68,6 +83,7 @@ class TopicListScreen(Screen):
             padding=[5, 0, 5, 0]
         )
         recycle_layout.bind(minimum_height=recycle_layout.setter('height'))
+        self.rv.bind(scroll_y=self.on_scroll)
         
         
         searchbar=SearchBar(
@@ -75,7 +91,8 @@ class TopicListScreen(Screen):
             size_hint=(0.7, 0.05),
             ts=self.ts,
             hint_text="Search topics here",
-            callback=self.on_search
+            callback=self.on_search,
+            type_callback=self.on_type
         )
         
         self.no_res_label=Label(text="No results", font_size=dp(20), color=(0,0,0,1), size_hint=(0.6, 0.2), pos_hint={'center_x':0.5, 'top':0.8})
@@ -113,6 +130,8 @@ class TopicListScreen(Screen):
 
     def handle_choose(self, topic_id):
         topic = self.ts.get(topic_id)
+        if self.usage:
+            self.usage.topic_viewed(topic_id, self._paging_category.id if self._paging_category else None) #no category while showing search results
         detail_screen = self.manager.get_screen('topic_detail')
         detail_screen.display_topic(topic.description, topic.source)
         detail_screen.db_id=topic_id # to lay the groundwork for tracking/usage history
@@ -126,14 +145,14 @@ class TopicListScreen(Screen):
         self.title_label.text = category.title
         
         if(self.current_category == category):
-            print("same category")
+            print("same category") #e.g. coming back from the detail screen, not a new selection
             return
         
         self.current_category=category
+        if self.usage:
+            self.usage.category_selected(category.id)
 
-        topics = self.ts.list_by_category(category)
-        
-        self.update_buttons(topics)
+        self.show_category(category)
         
         # very hacky and not pretty but by god it works 
         (_,size_y)=self.rv.size
@@ -142,35 +161,86 @@ class TopicListScreen(Screen):
             Clock.schedule_once(lambda dt: self.animate_scroll_to(1.0, 0.5),0.2)
 
   
+    def reload_data(self):
+        """Call after the underlying data changed outside of the topic service, e.g. when the database got reloaded"""
+        self.title_index.build(self.ts.list_all())
+        self.current_category=None #the next on_pre_enter loads the list again, even for the same category
+  
     def on_enter(self):
         if self.js:
             Clock.schedule_interval(self.check_joystick_events, 0.1)                
             
     def on_search(self, keyword: str):
-        """Triggers button update with topics that match the keyword in the title"""
+        """Triggers button update with topics that match the keyword in their title or description, best match first"""
         if(keyword):
-            results=self.ts.search(keyword) #returns list of IDs
+            results=self.ts.search_ranked(keyword) #ranked results already contain id and title, no need to load the topics
             if(results):
-                topics = self.ts.get_many(results) #returns list of Topics
-                self.update_buttons(topics)
+                self.show_no_results(False)
+                self.update_buttons(results)
             else:
                 self.rv.data={}
                 self.show_no_results(True)
         else:
             self.show_no_results(False)
-            topics = self.ts.list_by_category(self.current_category)
-            self.update_buttons(topics)
+            self.show_category(self.current_category)
+    
+    def on_type(self, text: str):
+        """Live suggestions while typing, title prefixes only. The full text search still runs on enter"""
+        if not text.strip():
+            self.on_search("")
+            return
+        
+        results = self.title_index.suggest(text, k=30)
+        self.show_no_results(not results)
+        self.update_buttons(results)
         
         
     def update_buttons(self, topics: List[Topic]):
-        """Updates the buttons shown based on a list of Topics"""
+        """Updates the buttons shown based on a list of Topics (anything with an id and title works)"""
+        self._paging_category=None #not a category list anymore, nothing to load on scroll
+        self.rv.data = self._button_data(topics)
+    
+    def _button_data(self, topics) -> List[dict]:
         # Feed the view props via rv.data (keys must match viewclass properties)
-        self.rv.data = [{
+        return [{
                 'text': t.title,         # still sets the Button label
                 'topic_id': t.id,
                 'on_choose': self.handle_choose
             } for t in topics]
     
+    def show_category(self, category):
+        """Shows the first page of a category, the rest is loaded by load_more"""
+        self.update_buttons([])
+        if category is None:
+            return
+        self._paging_category=category
+        self._last_id=0
+        self._exhausted=False
+        self._ranked=None
+        if self.ranker:
+            # ids and titles only, cheap even for large categories. The scores are already in memory
+            self._ranked=self.ranker.rank(self.ts.list_summaries_by_category(category, 0, -1))
+        self.load_more()
+    
+    def load_more(self):
+        """Appends the next page of the current category to the list, only titles are loaded"""
+        if self._paging_category is None or self._exhausted:
+            return
+        if self._ranked is not None:
+            shown=len(self.rv.data)
+            page = self._ranked[shown:shown+self.PAGE_SIZE]
+        else:
+            page = self.ts.list_summaries_by_category(self._paging_category, self._last_id, self.PAGE_SIZE)
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted=True
+        if page:
+            self._last_id=page[-1].id
+            self.rv.data.extend(self._button_data(page))
+    
+    def on_scroll(self, _, scroll_y):
+        if scroll_y <= 0.1: #scroll_y is 0 at the bottom
+            self.load_more()
+    
     def show_no_results(self, show:bool):
         if (not show): #no reason just switched it around at first and am too lazy to change it
             self.no_res_label.color=(0,0,0,0)
@@ -199,6 +269,9 @@ class TopicListScreen(Screen):
                     self.update_selection()
                     self.scroll_with_selection()
                 case Intent.DOWN:
+                    if self.selection_index >= max_items-5: #load the next page before the selection hits the end
+                        self.load_more()
+                        max_items=len(self.rv.data)
                     self.selection_index=min(max_items-1, self.selection_index+1)
                     self.update_selection()
                     self.scroll_with_selection()
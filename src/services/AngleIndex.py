@@ -0,0 +1,53 @@
+from typing import Dict, Iterable, List, Tuple
+from data.Category import Category
+
+
+def angle_in_range(angle: float, category: Category) -> bool:
+    """Same check as the old get_for_angle query, including slices that wrap around 0"""
+    if category.angle_begin <= category.angle_end:
+        return category.angle_begin <= angle <= category.angle_end
+    return angle >= category.angle_begin or angle <= category.angle_end
+
+
+class AngleIndex:
+    """Lookup table with one entry per degree, pointing to the category of that slice (or None).
+    If slices overlap, the category with the lowest ID wins, just like the first row of the old query did.
+    The table is never changed after building, a new index gets built instead."""
+
+    def __init__(self, categories: Iterable[Category] = ()):
+        self._table: List[Category | None] = [None] * 360
+        self._claims: List[List[int]] = [[] for _ in range(360)] #ids of all categories covering each degree
+        
+        for category in sorted(categories, key=lambda c: c.id):
+            for angle in range(360):
+                if angle_in_range(angle, category):
+                    if self._table[angle] is None:
+                        self._table[angle] = category
+                    self._claims[angle].append(category.id)
+
+    def lookup(self, angle: float) -> Category | None:
+        return self._table[int(angle) % 360] #normalizing at the boundary, 360° is 0°
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """(first, last) degrees of every range that belongs to no category"""
+        return [(begin, end) for begin, end, claims in self._runs() if not claims]
+
+    def overlaps(self) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        """(first, last, category ids) of every range claimed by more than one category"""
+        return [(begin, end, claims) for begin, end, claims in self._runs() if len(claims) > 1]
+
+    def validate(self) -> Dict[str, list]:
+        return {"gaps": self.gaps(), "overlaps": self.overlaps()}
+
+    def _runs(self) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        """Groups consecutive degrees with the same claims. A run crossing 0° is reported as one, e.g. (348, 41)"""
+        runs = []
+        for angle in range(360):
+            claims = tuple(self._claims[angle])
+            if runs and runs[-1][2] == claims:
+                runs[-1][1] = angle
+            else:
+                runs.append([angle, angle, claims])
+        if len(runs) > 1 and runs[0][2] == runs[-1][2]:
+            runs[0][0] = runs.pop()[0]
+        return [tuple(run) for run in runs]
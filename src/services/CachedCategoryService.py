@@ -0,0 +1,45 @@
+from typing import List
+from data.Category import Category
+from database.database_manager import Manager
+from services.CategoryService import CategoryService
+from services.LRUCache import LRUCache
+
+
+class CachedCategoryService(CategoryService):
+    """CategoryService with a read-through LRU cache in front of list, get and get_for_title (get_for_angle has its own index).
+    Every committed change invalidates the entries of that category and its old and new title.
+    Changes made by other processes are noticed through content_version (migration 6) on the next angle lookup, or call clear()."""
+    
+    def __init__(self, db: Manager, maxsize: int = 512):
+        super().__init__(db)
+        self.cache = LRUCache(maxsize)
+    
+    def list(self) -> List[Category]:
+        return list(self.cache.get_or_load(("all",), super().list))
+    
+    def get(self, id: int) -> Category | None:
+        return self.cache.get_or_load(("category", id), lambda: super(CachedCategoryService, self).get(id))
+    
+    def get_for_title(self, title: str) -> Category | None:
+        return self.cache.get_or_load(("title", title), lambda: super(CachedCategoryService, self).get_for_title(title))
+    
+    def _changed(self, old: Category | None, new: Category | None):
+        changed = [category for category in (old, new) if category]
+        self.cache.invalidate(("all",), ("category", changed[0].id), *[("title", category.title) for category in changed])
+        super()._changed(old, new)
+    
+    def _changed_elsewhere(self):
+        self.cache.clear()
+        super()._changed_elsewhere()
+    
+    def _rolled_back(self):
+        self.cache.clear() #no telling which of the entries invalidated so far changed back
+        super()._rolled_back()
+    
+    def clear(self):
+        self.cache.clear()
+        self.rebuild_angle_index()
+    
+    def stats(self) -> dict:
+        """hit/miss counters of the cache"""
+        return self.cache.stats()
@@ -0,0 +1,107 @@
+from typing import Iterable, List
+from data.Topic import Topic
+from data.Category import Category
+from data.TopicSummary import TopicSummary
+from database.database_manager import Manager
+from services.TopicService import TopicService
+from services.LRUCache import LRUCache
+
+
+class CachedTopicService(TopicService):
+    """TopicService with a read-through LRU cache in front of get, list_all, list_by_category, list_summaries_by_category and get_assignments.
+    Writes made through this service invalidate exactly the entries they affect.
+    Changes made by other processes are not noticed, call clear() for that.
+    Writes invalidate before calling the base class, its listeners (e.g. TitleIndex) read the changed topic through this cache."""
+    
+    def __init__(self, db: Manager, maxsize: int = 256):
+        super().__init__(db)
+        self.cache = LRUCache(maxsize)
+    
+    def list_all(self) -> List[Topic]:
+        return list(self.cache.get_or_load(("all",), super().list_all)) #copies, so callers can't change the cached list
+    
+    def list_by_category(self, category_id: int | Category) -> List[Topic]:
+        if isinstance(category_id, Category):
+            category_id = category_id.id
+        return list(self.cache.get_or_load(("category", category_id), lambda: super(CachedTopicService, self).list_by_category(category_id)))
+    
+    def list_summaries_by_category(self, category_id: int | Category, after_id: int = 0, limit: int = 50) -> List[TopicSummary]:
+        if isinstance(category_id, Category):
+            category_id = category_id.id
+        return list(self.cache.get_or_load(("summaries", category_id, after_id, limit), lambda: super(CachedTopicService, self).list_summaries_by_category(category_id, after_id, limit)))
+    
+    def get(self, topic_id: int) -> Topic | None:
+        return self.cache.get_or_load(("topic", topic_id), lambda: super(CachedTopicService, self).get(topic_id))
+    
+    def _load_chunk(self, topic_ids: List[int]) -> List[Topic]:
+        # cached topics are taken as they are, only the rest is queried and then cached too
+        missing = object()
+        topics = {id: self.cache.get(("topic", id), missing) for id in set(topic_ids)}
+        missing_ids = [id for id, topic in topics.items() if topic is missing]
+        loaded = super()._load_chunk(missing_ids) if missing_ids else []
+        for topic in loaded:
+            self.cache.put(("topic", topic.id), topic)
+            topics[topic.id] = topic
+        return [topics[id] for id in topic_ids if topics[id] is not missing and topics[id] is not None]
+    
+    def get_assignments(self, topic_id: int) -> List[int]:
+        return list(self.cache.get_or_load(("assignments", topic_id), lambda: super(CachedTopicService, self).get_assignments(topic_id)))
+    
+    def update(self, id: Topic | int, new_title: str | None = None, new_desc: str|None = None, new_source: str|None = None):
+        topic_id = id.id if isinstance(id, Topic) else id
+        categories = self.get_assignments(topic_id) #the topic shows up in the lists of these categories
+        self._invalidate_topic(topic_id, categories)
+        super().update(id, new_title, new_desc, new_source)
+    
+    def set_assignment(self, topic_id: int, category_ids: List[int]):
+        old_categories = self.get_assignments(topic_id)
+        super().set_assignment(topic_id, category_ids)
+        changed = set(old_categories) | set(category_ids)
+        self.cache.invalidate(("assignments", topic_id), *[("category", id) for id in changed])
+        self._invalidate_summaries(changed)
+    
+    def update_fields(self, topic_id: int, **changed: str):
+        if changed:
+            categories = self.get_assignments(topic_id)
+            self.cache.invalidate(("topic", topic_id), ("all",), *[("category", id) for id in categories])
+            if "title" in changed: #the summaries only contain titles
+                self._invalidate_summaries(categories)
+        super().update_fields(topic_id, **changed)
+    
+    def bulk_assign(self, topic_ids: Iterable[int], add: Iterable[int] = (), remove: Iterable[int] = ()):
+        topic_ids, add, remove = set(topic_ids), set(add), set(remove)
+        super().bulk_assign(topic_ids, add, remove)
+        changed = add | remove
+        if topic_ids and changed:
+            self.cache.invalidate(*[("assignments", id) for id in topic_ids], *[("category", id) for id in changed])
+            self._invalidate_summaries(changed)
+    
+    def add_topic(self) -> int:
+        topic_id = super().add_topic()
+        self.cache.invalidate(("all",), ("topic", topic_id)) #new topics have no categories yet
+        return topic_id
+    
+    def remove_topic(self, topic_id: int | Topic):
+        if isinstance(topic_id, Topic):
+            topic_id=topic_id.id
+        categories = self.get_assignments(topic_id)
+        self._invalidate_topic(topic_id, categories)
+        self.cache.invalidate(("assignments", topic_id))
+        super().remove_topic(topic_id)
+    
+    def _invalidate_topic(self, topic_id: int, categories: List[int]):
+        self.cache.invalidate(("topic", topic_id), ("all",), *[("category", id) for id in categories])
+        self._invalidate_summaries(categories)
+    
+    def _invalidate_summaries(self, categories):
+        """pages start at arbitrary ids, so every page of the categories goes"""
+        categories = set(categories)
+        if categories:
+            self.cache.invalidate_where(lambda key: key[0] == "summaries" and key[1] in categories)
+    
+    def clear(self):
+        self.cache.clear()
+    
+    def stats(self) -> dict:
+        """hit/miss counters of the cache"""
+        return self.cache.stats()
@@ -1,18 +1,76 @@
-from typing import List
+import time
+from contextlib import contextmanager
+from typing import Dict, List
 from data.Category import Category
 from database.database_manager import Manager #just adding this for pylance purposes to make debugging a tiny bit easier
+from services.AngleIndex import AngleIndex
 
 class CategoryService:
+    VERSION_CHECK_INTERVAL = 1.0 #seconds, how often lookups check content_version for changes made by other processes
+    
     def __init__(self, db: Manager):
         self.db = db
+        self._angle_index = None #built on first use, the table might not exist when the service is created
+        self._angle_version = None #content_version the index was built at
+        self._version_checked = 0.0
+        self._has_version = None #whether the content_version table (migration 6) exists
+    
+    def _changed(self, old: Category | None, new: Category | None):
+        """Called after every committed change of a category with its state before and after. Either is None on insert/delete.
+        Subclasses that keep data derived from categories (e.g. caches) hook in here"""
+        self.rebuild_angle_index()
+    
+    def rebuild_angle_index(self):
+        """Reloads all slices from the database. The new index replaces the old one in one step, lookups never see a half built one"""
+        self._angle_version = self._content_version()
+        self._angle_index = AngleIndex(CategoryService.list(self)) #always straight from the database, never from a cache
+    
+    def _changed_elsewhere(self):
+        """Called when content_version moved without a change through this service, e.g. the config tool changed the layout.
+        Subclasses with caches clear them here"""
+        self.rebuild_angle_index()
+    
+    def _content_version(self) -> int | None:
+        """content_version counter (migration 6), None if the database doesn't have it"""
+        if self._has_version is None:
+            self._has_version = self.db.execute("SELECT 1 FROM sqlite_master WHERE name='content_version'").fetchone() is not None
+        if not self._has_version:
+            return None
+        cursor = self.db.execute("SELECT version FROM content_version")
+        row = cursor.fetchone() if cursor else None
+        return row[0] if row else None
+    
+    def _rolled_back(self):
+        """Called when a transaction of this service failed, anything derived from the changes made so far is wrong now"""
+        self.rebuild_angle_index()
+    
+    @contextmanager
+    def _transaction(self):
+        """db.transaction() that also repairs the derived data if it gets rolled back. Nests like db.transaction()"""
+        try:
+            with self.db.transaction():
+                yield
+        except BaseException:
+            self._rolled_back()
+            raise
+    
+    def _angles(self) -> AngleIndex:
+        if self._angle_index is None:
+            self.rebuild_angle_index()
+        elif time.monotonic() - self._version_checked >= self.VERSION_CHECK_INTERVAL:
+            # other processes write to the same file, a single row read tells whether anything changed
+            self._version_checked = time.monotonic()
+            if self._content_version() != self._angle_version:
+                self._changed_elsewhere()
+        return self._angle_index
     
     def list(self) -> List[Category]:
         """Returns list of all categories. Sorted ASC by ID"""
-        query = self.db.execute("SELECT * from categories").fetchall()
-        return sorted([Category(id,title,ab,ae) for (id,title,ab,ae) in query], key=lambda x:x.id)
+        query = self.db.execute("SELECT id, title, angle_begin, angle_end from categories ORDER BY id").fetchall()
+        return [Category(id,title,ab,ae) for (id,title,ab,ae) in query]
     
     def get(self, id:int) -> Category | None:
-        query = self.db.execute("SELECT * from categories where id=?", (id,)).fetchone()  
+        query = self.db.execute("SELECT id, title, angle_begin, angle_end from categories where id=?", (id,)).fetchone()  
         if not query:
             return None
         id, title, ab, ae = query
@@ -20,26 +78,25 @@ class CategoryService:
     
     def rename(self, id: Category | int, new_title: str):
         if isinstance(id, Category):
-            id = Category.id    
-        self.db.execute("UPDATE categories SET title=? WHERE id=?", (id,new_title))
+            id = id.id    
+        old = self.get(id)
+        self.db.execute("UPDATE categories SET title=? WHERE id=?", (new_title,id))
         self.db.commit_changes()
+        if old:
+            self._changed(old, Category(id, new_title, old.angle_begin, old.angle_end))
         
     def get_for_angle(self, angle:int) -> Category | None:
-        query = self.db.execute("SELECT * FROM categories WHERE (angle_begin <= angle_end AND ? BETWEEN angle_begin AND angle_end) \
-            OR (angle_begin > angle_end AND (? >= angle_begin OR ? <= angle_end))", (angle,angle,angle)).fetchone()
-            #angle wrapping
-        if not query:
-            return None
-        id, title, ab, ae = query
-        if query and all(query): #if there is actually data
-            return Category(id,title,ab,ae)
-        
-        #return none in any other case
-        return None
+        """Returns the category whose slice contains the angle. Answered from the in-memory angle index,
+        at most once per VERSION_CHECK_INTERVAL a single row query checks whether another process changed the categories"""
+        return self._angles().lookup(angle)
+    
+    def validate_ranges(self) -> Dict[str, list]:
+        """Reports degrees that belong to no slice ("gaps": [(first, last)]) or to several ("overlaps": [(first, last, ids)])"""
+        return self._angles().validate()
     
     def get_similar(self, name:str) -> List[Category] | None:
         """Returns list of Categories with a *similar* title"""
-        query = self.db.execute("SELECT * FROM categories WHERE title LIKE ?", (name,)).fetchall()
+        query = self.db.execute("SELECT id, title, angle_begin, angle_end FROM categories WHERE title LIKE ?", (name,)).fetchall()
         if query and all(query):
             return [Category(id, title,ab,ae) for (id,title,ab,ae) in query]
         
@@ -47,7 +104,7 @@ class CategoryService:
     
     def get_for_title(self, title:str) -> Category | None:
         """Returns Category with given name if exists"""
-        query = self.db.execute("SELECT * FROM categories WHERE title=?", (title,)).fetchone()
+        query = self.db.execute("SELECT id, title, angle_begin, angle_end FROM categories WHERE title=?", (title,)).fetchone()
         
         if query and all(query):
             id, title,ab,ae = query
@@ -62,22 +119,25 @@ class CategoryService:
         angle_begin=angle_begin%360
         angle_end=angle_end%360
         
-        
-        if not handle_overflow:
-            self.db.execute("UPDATE categories SET angle_begin=?, angle_end=? WHERE id=?", (angle_begin,angle_end,category.id))
-            self.db.commit_changes()
-            return
-        
-        #checking if end and begin are in range of another category
-        next_category = self.get_for_angle(angle_end)
-        previous_category = self.get_for_angle(angle_begin)
-        
-        if(next_category):
-            self.assign_angle(next_category,angle_end, next_category.angle_end,False)
-        if(previous_category):
-            self.assign_angle(previous_category,previous_category.angle_begin, angle_end,False)
-        
-        self.assign_angle(category, angle_begin, angle_end, False)
+        #one transaction for the category and all neighbours moved along with it
+        with self._transaction():
+            if not handle_overflow:
+                old = self.get(category.id)
+                self.db.execute("UPDATE categories SET angle_begin=?, angle_end=? WHERE id=?", (angle_begin,angle_end,category.id))
+                if old:
+                    self._changed(old, Category(old.id, old.title, angle_begin, angle_end))
+                return
+        
+            #checking if end and begin are in range of another category
+            next_category = self.get_for_angle(angle_end)
+            previous_category = self.get_for_angle(angle_begin)
+        
+            if(next_category):
+                self.assign_angle(next_category,angle_end, next_category.angle_end,False)
+            if(previous_category):
+                self.assign_angle(previous_category,previous_category.angle_begin, angle_end,False)
+        
+            self.assign_angle(category, angle_begin, angle_end, False)
     
     def create_category(self, title:str, angle_begin:int, angle_end:int, handle_overflow:bool=True):
         """Creates a new category based on data provided. Handles overflow by default.
@@ -90,14 +150,15 @@ class CategoryService:
             return
         
         print(f"No same category found, creating new one: {title} -> from {angle_begin} to {angle_end}")
-        self.db.execute("INSERT INTO categories (title, angle_begin, angle_end) VALUES (?, ?, ?)", (title,0,0))
-        self.db.commit_changes()
+        with self._transaction():
+            self.db.execute("INSERT INTO categories (title, angle_begin, angle_end) VALUES (?, ?, ?)", (title,0,0))
         
-        #getting the ID of the new topic
-        new_category = self.db.execute("SELECT * FROM categories WHERE title=? AND angle_begin=0 AND angle_end=0", (title,)).fetchone()
-        id=new_category[0]
+            #getting the ID of the new topic
+            new_category = self.db.execute("SELECT id FROM categories WHERE title=? AND angle_begin=0 AND angle_end=0", (title,)).fetchone()
+            id=new_category[0]
+            self._changed(None, Category(id,title,0,0))
         
-        self.assign_angle(Category(id,title,0,0), angle_begin, angle_end, handle_overflow)
+            self.assign_angle(Category(id,title,0,0), angle_begin, angle_end, handle_overflow)
     
     def delete_category(self, category:Category, leave_empty:bool=False):
         """Deletes a given category from the Database. By default, the hole created will be closed by the categories surrounding it."""
@@ -106,19 +167,44 @@ class CategoryService:
             print(f"No category provided: {category}")
             return
         
-        self.db.execute("DELETE FROM categories WHERE id=?", (category.id,))
-        self.db.commit_changes()
+        with self._transaction():
+            self.db.execute("DELETE FROM categories WHERE id=?", (category.id,))
+            self._changed(category, None)
         
-        if not leave_empty:
+            if not leave_empty:
             
-            distance=abs(category.angle_end-category.angle_begin)/2
+                distance=abs(category.angle_end-category.angle_begin)/2
             
-            next_category=self.db.execute("SELECT * FROM categories WHERE angle_begin>=?",(category.angle_end,)).fetchone()
-            prev_category=self.db.execute("SELECT * FROM categories WHERE angle_end<=?",(category.angle_begin,)).fetchone()
+                next_category=self.db.execute("SELECT id FROM categories WHERE angle_begin>=?",(category.angle_end,)).fetchone()
+                prev_category=self.db.execute("SELECT id FROM categories WHERE angle_end<=?",(category.angle_begin,)).fetchone()
             
-            #just to get the Category object bc i'm too lazy to make it myself thanks
-            next_category=self.get(next_category[0])
-            prev_category=self.get(prev_category[0])
+                #just to get the Category object bc i'm too lazy to make it myself thanks
+                next_category=self.get(next_category[0])
+                prev_category=self.get(prev_category[0])
 
-            self.assign_angle(next_category,(next_category.angle_begin-distance), next_category.angle_end, False)
-            self.assign_angle(prev_category,prev_category.angle_begin,(prev_category.angle_end+distance),False)
\ No newline at end of file
+                self.assign_angle(next_category,(next_category.angle_begin-distance), next_category.angle_end, False)
+                self.assign_angle(prev_category,prev_category.angle_begin,(prev_category.angle_end+distance),False)
+    
+    def apply_layout(self, slices: Dict[int, str]):
+        """Replaces the whole wheel layout in one transaction. slices maps the starting angle of each slice to its title, in wheel order.
+        Categories with a title from the layout are kept (and only get new angles), all others are deleted.
+        Either the complete layout is applied or, if anything fails, nothing at all."""
+        slice_angles = list(slices.keys())
+        slice_names = list(slices.values())
+        
+        with self._transaction():
+            all_categories = self.list()
+            #check if there are any existing categories to later just be updated
+            for name in slice_names:
+                existing_category = self.get_for_title(name)
+                if existing_category:
+                    print(f"Found: {existing_category}")
+                    all_categories.remove(existing_category)
+            
+            #deleting all categories to be replaced
+            for category in all_categories:
+                self.delete_category(category, True)
+            
+            for i in range(len(slice_angles)):
+                self.create_category(slice_names[i],slice_angles[i],(slice_angles[(i+1) % len(slice_angles)]-1),True)
+                                                                        # -1 to remove overlap
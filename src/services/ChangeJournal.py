@@ -0,0 +1,95 @@
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Set
+
+from database.database_manager import Manager
+from database.migrations import JOURNALED_TABLES
+
+
+class ChangeJournal:
+    """Undo/redo for edits of topics and assignments. Changes made inside record() are logged row by row by triggers (migration 8)
+    into change_journal as json before/after images. undo() writes the before images of the last batch back, redo() the after images,
+    both only touch the rows of that batch. Only the last keep batches are kept.
+    Use a Manager on the file, not the mirror. Cached services have to be told about the returned rows (or cleared)."""
+
+    def __init__(self, db: Manager, keep: int = 100):
+        self.db = db
+        self.keep = keep
+
+    @contextmanager
+    def record(self, label: str):
+        """with journal.record("Remove topic"): ... everything changed inside becomes one undo step, committed as one transaction.
+        A step that changed something throws away the steps that were undone (nothing left to redo)"""
+        with self.db.transaction():
+            batch = self.db.execute("INSERT INTO change_batches (label, time) VALUES (?, ?)", (label, str(datetime.now()))).lastrowid
+            self.db.execute("UPDATE journal_state SET batch=?", (batch,))
+            yield
+            self.db.execute("UPDATE journal_state SET batch=NULL")
+
+            if self.db.execute("SELECT 1 FROM change_journal WHERE batch=? LIMIT 1", (batch,)).fetchone() is None:
+                self.db.execute("DELETE FROM change_batches WHERE id=?", (batch,)) #nothing journaled, e.g. renaming a category
+            else:
+                self.db.execute("DELETE FROM change_journal WHERE batch IN (SELECT id FROM change_batches WHERE undone=1)")
+                self.db.execute("DELETE FROM change_batches WHERE undone=1")
+                self.db.execute("DELETE FROM change_journal WHERE batch <= ?", (batch - self.keep,))
+                self.db.execute("DELETE FROM change_batches WHERE id <= ?", (batch - self.keep,))
+
+    def undo_label(self) -> str | None:
+        """label of the step undo() would revert, None if there is none"""
+        row = self.db.execute("SELECT label FROM change_batches WHERE undone=0 ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def redo_label(self) -> str | None:
+        row = self.db.execute("SELECT label FROM change_batches WHERE undone=1 ORDER BY id LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def undo(self) -> Dict[str, Set[int]] | None:
+        """Reverts the last recorded step. Returns the affected topic ids, see _replay. None if there was nothing to undo"""
+        row = self.db.execute("SELECT id FROM change_batches WHERE undone=0 ORDER BY id DESC LIMIT 1").fetchone()
+        return self._replay(row[0], undo=True) if row else None
+
+    def redo(self) -> Dict[str, Set[int]] | None:
+        """Applies the last undone step again"""
+        row = self.db.execute("SELECT id FROM change_batches WHERE undone=1 ORDER BY id LIMIT 1").fetchone()
+        return self._replay(row[0], undo=False) if row else None
+
+    def _replay(self, batch: int, undo: bool) -> Dict[str, Set[int]]:
+        """Moves every row of the batch from one image to the other, newest change first for undo.
+        Raises ValueError (and changes nothing) if one of the rows was changed since, e.g. by the importer.
+        Returns {"topics": ids of topics that were changed, added or removed, "assignments": ids of topics whose categories changed}"""
+        order = "DESC" if undo else "ASC"
+        affected = {"topics": set(), "assignments": set()}
+
+        with self.db.transaction():
+            entries = self.db.execute(f"SELECT tbl, row_id, before, after FROM change_journal WHERE batch=? ORDER BY id {order}", (batch,)).fetchall()
+            for table, row_id, before, after in entries:
+                current, target = (after, before) if undo else (before, after)
+                columns = JOURNALED_TABLES[table]
+                if self._image(table, row_id) != current:
+                    raise ValueError(f"{table} row {row_id} was changed outside of the content manager since, can't {'undo' if undo else 'redo'} this step")
+
+                if target is None:
+                    self.db.execute(f"DELETE FROM {table} WHERE id=?", (row_id,))
+                else:
+                    # execute_many, because execute() refuses None parameters and images can hold NULLs (e.g. a topic without source)
+                    values = json.loads(target)
+                    if current is None:
+                        self.db.execute_many(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                                             [tuple(values[column] for column in columns)])
+                    else:
+                        self.db.execute_many(f"UPDATE {table} SET {', '.join(f'{column}=?' for column in columns[1:])} WHERE id=?",
+                                             [(*[values[column] for column in columns[1:]], row_id)])
+
+                if table == "topics":
+                    affected["topics"].add(row_id)
+                else:
+                    affected["assignments"].update(json.loads(image)["topic_id"] for image in (before, after) if image)
+            self.db.execute("UPDATE change_batches SET undone=? WHERE id=?", (int(undo), batch))
+        return affected
+
+    def _image(self, table: str, row_id: int) -> str | None:
+        """the row as json, made the same way the triggers do it"""
+        image = ", ".join(f"'{column}', {column}" for column in JOURNALED_TABLES[table])
+        row = self.db.execute(f"SELECT json_object({image}) FROM {table} WHERE id=?", (row_id,)).fetchone()
+        return row[0] if row else None
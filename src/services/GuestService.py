@@ -1,21 +1,138 @@
 from data.Guest import Guest
+from data.RatingStats import RatingStats
 from database.database_manager import Manager
+from database.write_behind import WriteBehindQueue
 from dataclasses import astuple
-from datetime import datetime
+from datetime import date, datetime
 
-from typing import List
+from typing import Dict, Iterator, List
 
 
 class GuestService:
-    def __init__(self, db:Manager):
+    def __init__(self, db:Manager, write_behind: bool = False):
+        """With write_behind set, add_entry only queues the guest and a background thread does the actual writing.
+        Requires a pooled Manager. Call stop() before closing the application so nothing gets lost."""
         self.db = db
+        self.writer = None
+        if write_behind:
+            self.writer = WriteBehindQueue(db, "INSERT INTO guests (name, institution,role,purpose_of_visit, date) VALUES (?,?,?,?,?)", name="Guest Writer")
+            self.writer.start()
     
     def list(self) -> List[Guest]:
-        query = self.db.execute("SELECT * FROM guests").fetchall()
-        return sorted([Guest(id,name,inst,role,pov,date) for (id,name,inst,role,pov,date) in query], key=lambda x:x.id)
+        query = self.db.execute("SELECT id, name, institution, role, purpose_of_visit, date FROM guests ORDER BY id").fetchall()
+        return [Guest(id,name,inst,role,pov,date) for (id,name,inst,role,pov,date) in query]
+    
+    def iter_guests(self, since: date | datetime | None = None, until: date | datetime | None = None, batch_size: int = 500) -> Iterator[Guest]:
+        """Yields guests ordered by date, loading batch_size rows at a time, so memory use doesn't grow with the guestbook.
+        since is inclusive, until exclusive. Both can be left out"""
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("date >= ?")
+            params.append(str(since)) #dates are stored as str(datetime), comparing the text compares the dates
+        if until is not None:
+            conditions.append("date < ?")
+            params.append(str(until))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        cursor = self.db.execute(f"SELECT id, name, institution, role, purpose_of_visit, date FROM guests{where} ORDER BY date, id", tuple(params))
+        if cursor is None:
+            return
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for (id,name,inst,role,pov,date) in rows:
+                yield Guest(id,name,inst,role,pov,date)
+    
+    def list_page(self, after: Guest | None = None, limit: int = 50, name: str = "", institution: str = "",
+                  since: date | datetime | None = None, until: date | datetime | None = None) -> List[Guest]:
+        """One page of guests, pass the last guest of the previous page as after to get the next one. An empty list means there is nothing left.
+        name matches the start of the name, institution the whole institution, both ignoring case. since is inclusive, until exclusive.
+        Sorted by name while searching for a name, by date with an institution or date filter, by id otherwise,
+        so each page is a range of one of the guests indexes (migrations 4 and 9) and later pages cost the same as the first one"""
+        conditions, params = [], []
+        if name:
+            order = ("name COLLATE NOCASE", "name")
+            conditions.append("name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?")
+            params += [name, name + "\U0010ffff"] #sorts after everything starting with name
+        elif institution or since is not None or until is not None:
+            order = ("date", "date")
+        else:
+            order = None
+        
+        if institution:
+            conditions.append("institution = ? COLLATE NOCASE")
+            params.append(institution)
+        lower = str(since) if since is not None else None #dates are stored as str(datetime), comparing the text compares the dates
+        if order and order[1] == "date" and after is not None and after.date is not None:
+            lower = max(lower or "", str(after.date)) #one lower bound, sqlite doesn't always pick the tighter of two
+        if lower is not None:
+            conditions.append("date >= ?")
+            params.append(lower)
+        if until is not None:
+            conditions.append("date < ?")
+            params.append(str(until))
+        
+        if after is not None:
+            if order is None:
+                conditions.append("id > ?")
+                params.append(after.id)
+            elif getattr(after, order[1]) is None: #NULLs sort first
+                conditions.append(f"(({order[1]} IS NULL AND id > ?) OR {order[1]} IS NOT NULL)")
+                params.append(after.id)
+            else:
+                conditions.append(f"({order[0]}, id) > (?, ?)")
+                params += [str(getattr(after, order[1])), after.id]
+        
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        order_by = f"{order[0]}, id" if order else "id"
+        cursor = self.db.execute(f"SELECT id, name, institution, role, purpose_of_visit, date FROM guests{where} ORDER BY {order_by} LIMIT ?", (*params, limit))
+        if cursor is None:
+            return []
+        return [Guest(id,name,inst,role,pov,date) for (id,name,inst,role,pov,date) in cursor.fetchall()]
+    
+    def institutions(self) -> List[str]:
+        """Every institution guests entered, ignoring case. Read from the institution index"""
+        cursor = self.db.execute("SELECT DISTINCT institution COLLATE NOCASE FROM guests WHERE institution IS NOT NULL ORDER BY 1")
+        return [institution for (institution,) in cursor.fetchall()] if cursor else []
+    
+    def rating_stats(self, dimension: str = "all") -> Dict[str, RatingStats]:
+        """Rating distributions grouped by "day" (YYYY-MM-DD), "institution" or "role". "all" has a single entry with the key "".
+        Read from the counters kept by the guests triggers (migration 5), the cost doesn't depend on the number of guests"""
+        return self._rating_stats("SELECT value, rating, count FROM guest_rating_counts WHERE dimension=?", (dimension,))
+    
+    def rating_stats_by_day(self, since: date | None = None, until: date | None = None) -> Dict[str, RatingStats]:
+        """Rating distribution per day, since inclusive, until exclusive. Only reads the counters of the days in the range"""
+        conditions, params = ["dimension='day'"], []
+        if since is not None:
+            conditions.append("value >= ?")
+            params.append(since.isoformat()[:10])
+        if until is not None:
+            conditions.append("value < ?")
+            params.append(until.isoformat()[:10])
+        return self._rating_stats(f"SELECT value, rating, count FROM guest_rating_counts WHERE {' AND '.join(conditions)}", tuple(params))
+    
+    def rating_total(self, since: date | None = None, until: date | None = None) -> RatingStats:
+        """Distribution over all guests, or over the days in the range"""
+        if since is None and until is None:
+            return self.rating_stats("all").get("", RatingStats())
+        distribution = {}
+        for stats in self.rating_stats_by_day(since, until).values():
+            for rating, count in stats.distribution.items():
+                distribution[rating] = distribution.get(rating, 0) + count
+        return RatingStats(distribution)
+    
+    def _rating_stats(self, query: str, params: tuple) -> Dict[str, RatingStats]:
+        cursor = self.db.execute(query, params)
+        if cursor is None:
+            return {}
+        groups = {}
+        for value, rating, count in cursor.fetchall():
+            groups.setdefault(value, {})[rating] = count
+        return {value: RatingStats(distribution) for value, distribution in groups.items()}
     
     def get_for_id(self, id: int) -> Guest|None:
-        query = self.db.execute("SELECT * FROM guests WHERE id=?", (id,)).fetchone()
+        query = self.db.execute("SELECT id, name, institution, role, purpose_of_visit, date FROM guests WHERE id=?", (id,)).fetchone()
         if query:
             id,name,inst,role,pov,date = query
             return Guest(id,name,inst,role,pov,date)
@@ -25,8 +142,25 @@ class GuestService:
     def add_entry(self, guest:Guest):
         """Adds an entry based on guest provided. Does not require ID, nor datetime, both of which will be handled here separately."""
         _,name,institution,role,pov,_ = guest
+        if self.writer:
+            self.writer.put((name,institution,role,pov, datetime.now())) #timestamp of the visit, not of the write
+            return
         self.db.execute("INSERT INTO guests (name, institution,role,purpose_of_visit, date) VALUES (?,?,?,?,?)",(name,institution,role,pov, datetime.now()))
         self.db.commit_changes()
+    
+    def pending_entries(self) -> int:
+        """Number of guest entries that are queued but not written to the database yet"""
+        return self.writer.pending() if self.writer else 0
+    
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until all queued entries are written. Returns False on timeout"""
+        return self.writer.flush(timeout) if self.writer else True
+    
+    def stop(self, timeout: float | None = 5.0) -> bool:
+        """Writes the remaining entries and ends the background writer"""
+        if not self.writer:
+            return True
+        return self.writer.stop(timeout)
         
     def delete_entry(self, guest_id: int | Guest):
         if isinstance(guest_id, Guest):
@@ -0,0 +1,66 @@
+import threading
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, TypeVar
+
+from database.database_manager import Manager
+
+T = TypeVar("T")
+
+
+class PopularityRanker:
+    """Keeps a popularity score per topic in memory: views of the last window_days days, each day weighted by how long ago it was
+    (a view half_life_days ago counts half). The scores are computed from the daily counters in topic_view_days (migration 7)
+    and refreshed by a background thread, ranking a list never touches the database.
+    Use the Manager the views are written to, the explorer's mirror doesn't reload for usage events."""
+    
+    def __init__(self, db: Manager, half_life_days: float = 14.0, window_days: int = 90, interval: float = 300.0):
+        self.db = db
+        self.half_life_days = half_life_days
+        self.window_days = min(window_days, 499) #two placeholders per day, sqlite allows 999
+        self.interval = interval #seconds between refreshes
+        
+        self._scores: Dict[int, float] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread: return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="Popularity Refresh", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop_event.set()
+        self._thread = None
+    
+    def refresh(self, today: date | None = None):
+        """Recomputes all scores, the new ones replace the old ones in one step"""
+        today = today or date.today()
+        weights = [((today - timedelta(days=age)).isoformat(), 0.5 ** (age / self.half_life_days)) for age in range(self.window_days)]
+        values = ",".join(["(?,?)"] * len(weights))
+        
+        cursor = self.db.execute(f"""WITH weights (day, weight) AS (VALUES {values})
+                                     SELECT v.topic_id, SUM(v.views * w.weight) FROM weights AS w
+                                     INNER JOIN topic_view_days AS v ON v.day = w.day GROUP BY v.topic_id""",
+                                 tuple(value for weight in weights for value in weight))
+        if cursor is None: #not migrated yet, keep what we have
+            return
+        self._scores = dict(cursor.fetchall())
+    
+    def score(self, topic_id: int) -> float:
+        return self._scores.get(topic_id, 0.0)
+    
+    def rank(self, topics: Iterable[T]) -> List[T]:
+        """Most popular first, topics without views keep their order at the end. Works with anything that has an id"""
+        scores = self._scores #the refresh thread might swap it in the meantime
+        return sorted(topics, key=lambda topic: -scores.get(topic.id, 0.0))
+    
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e: #try again next round
+                print(f"Refreshing the topic popularity failed: {e}")
+            if self._stop_event.wait(self.interval):
+                break
+        self.db.close_thread_connection()
@@ -0,0 +1,130 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Tuple
+
+from data.Topic import Topic
+from data.SearchResult import SearchResult
+
+
+def normalize(text: str) -> str:
+    """lowercase, without accents and with collapsed whitespace, so "Über  Lernen" and "uber lernen" are the same"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+class TitleIndex:
+    """In-memory prefix index over topic titles for search-as-you-type.
+    Two sorted lists are searched with bisect: the full normalized titles (title starts with the query)
+    and every single word of each title (some word starts with the query word)."""
+
+    def __init__(self, topics: Iterable[Topic] = ()):
+        self._lock = threading.Lock()
+        self._titles: Dict[int, str] = {} #topic id -> title as shown
+        self._normalized: Dict[int, str] = {}
+        self._by_title: List[Tuple[str, int]] = [] #(normalized title, id)
+        self._by_word: List[Tuple[str, int]] = [] #(normalized word, id)
+        self.build(topics)
+
+    def attach(self, ts) -> "TitleIndex":
+        """Builds the index from all topics of the TopicService and keeps it updated on changes made through it"""
+        self.build(ts.list_all())
+        ts.add_listener(lambda topic_id: self._on_topic_changed(ts, topic_id))
+        return self
+
+    def build(self, topics: Iterable[Topic]):
+        titles = {topic.id: topic.title for topic in topics}
+        normalized = {id: normalize(title) for id, title in titles.items()}
+        by_title = sorted((title, id) for id, title in normalized.items())
+        by_word = sorted({(word, id) for id, title in normalized.items() for word in title.split()})
+
+        with self._lock: #swapping everything at once, lookups never see a half built index
+            self._titles, self._normalized, self._by_title, self._by_word = titles, normalized, by_title, by_word
+
+    def add(self, topic: Topic):
+        with self._lock:
+            self._remove(topic.id)
+            normalized = normalize(topic.title)
+            self._titles[topic.id] = topic.title
+            self._normalized[topic.id] = normalized
+            insort(self._by_title, (normalized, topic.id))
+            for word in set(normalized.split()):
+                insort(self._by_word, (word, topic.id))
+
+    def remove(self, topic_id: int):
+        with self._lock:
+            self._remove(topic_id)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def suggest(self, text: str, k: int = 20) -> List[SearchResult]:
+        """Returns up to k topics for the typed text. Titles starting with the text come first (score 0),
+        then titles where every typed word is the start of some word in the title (score 1). Both parts alphabetically"""
+        query = normalize(text)
+        if not query:
+            return []
+
+        with self._lock:
+            results = []
+            seen = set()
+            for title, id in self._prefix_range(self._by_title, query):
+                results.append(SearchResult(id, self._titles[id], "", 0.0))
+                seen.add(id)
+                if len(results) >= k:
+                    return results
+
+            # starting with the word that has the fewest matches keeps the candidate set small
+            ranges = sorted(((self._prefix_bounds(self._by_word, word), word) for word in set(query.split())), key=lambda r: r[0][1]-r[0][0])
+            (lo, hi), _ = ranges[0]
+            candidates = {id for _, id in self._by_word[lo:hi]} - seen
+            for (lo, hi), word in ranges[1:]:
+                if not candidates:
+                    break
+                if len(candidates) * 8 < hi - lo: #cheaper to look at the few remaining titles than at every matching word
+                    candidates = {id for id in candidates if any(w.startswith(word) for w in self._normalized[id].split())}
+                else:
+                    candidates &= {id for _, id in self._by_word[lo:hi]}
+
+            for id in heapq.nsmallest(k-len(results), candidates, key=self._normalized.__getitem__):
+                results.append(SearchResult(id, self._titles[id], "", 1.0))
+            return results
+
+    #---internals, expect the lock to be held
+
+    def _remove(self, topic_id: int):
+        normalized = self._normalized.pop(topic_id, None)
+        if normalized is None:
+            return
+        del self._titles[topic_id]
+        self._delete(self._by_title, (normalized, topic_id))
+        for word in set(normalized.split()):
+            self._delete(self._by_word, (word, topic_id))
+
+    @staticmethod
+    def _delete(entries: list, entry: tuple):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    @staticmethod
+    def _prefix_range(entries: list, prefix: str):
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            yield entries[i]
+            i += 1
+
+    @staticmethod
+    def _prefix_bounds(entries: list, prefix: str) -> Tuple[int, int]:
+        """slice of entries whose key starts with prefix"""
+        return bisect_left(entries, (prefix,)), bisect_right(entries, (prefix + "\U0010ffff",))
+
+    def _on_topic_changed(self, ts, topic_id: int):
+        topic = ts.get(topic_id)
+        if topic:
+            self.add(topic)
+        else:
+            self.remove(topic_id)
@@ -0,0 +1,116 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Set, Tuple
+
+from services.TitleIndex import normalize
+
+
+class TopicFilterIndex:
+    """In-memory index for narrowing a list of topics while typing. A topic matches if every typed word is the start of
+    its id, of a word in its title or of a word in the title of a category it is assigned to.
+    Kept as one sorted list of (token, id) pairs, each typed word is a bisect range in it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._titles: Dict[int, str] = {}
+        self._assignments: Dict[int, Set[int]] = {} #topic id -> category ids
+        self._category_titles: Dict[int, str] = {} #category id -> normalized title
+        self._tokens: Dict[int, Set[str]] = {}
+        self._by_token: List[Tuple[str, int]] = []
+
+    def build(self, items: Iterable[Tuple[int, str]], assignments: Dict[int, Iterable[int]] | None = None, categories: Iterable[Tuple[int, str]] = ()):
+        """items and categories are (id, title) pairs (Topic/Category work too, they are read as .id and .title if they have them),
+        assignments maps item ids to category ids"""
+        category_titles = {id: normalize(title) for id, title in map(self._pair, categories)}
+        titles = dict(map(self._pair, items))
+        assignments = {id: set((assignments or {}).get(id, ())) for id in titles}
+        tokens = {id: self._tokens_for(id, titles[id], assignments[id], category_titles) for id in titles}
+        by_token = sorted((token, id) for id, topic_tokens in tokens.items() for token in topic_tokens)
+
+        with self._lock: #swapping everything at once, filtering never sees a half built index
+            self._titles, self._assignments, self._category_titles = titles, assignments, category_titles
+            self._tokens, self._by_token = tokens, by_token
+
+    def set_item(self, item_id: int, title: str):
+        """Adds an item or updates its title"""
+        with self._lock:
+            self._titles[item_id] = title
+            self._assignments.setdefault(item_id, set())
+            self._reindex(item_id)
+
+    def set_assignments(self, item_id: int, category_ids: Iterable[int]):
+        with self._lock:
+            if item_id not in self._titles:
+                return
+            self._assignments[item_id] = set(category_ids)
+            self._reindex(item_id)
+
+    def change_assignments(self, item_ids: Iterable[int], add: Iterable[int] = (), remove: Iterable[int] = ()):
+        """Same as TopicService.bulk_assign, for the index"""
+        add, remove = set(add), set(remove)
+        with self._lock:
+            for item_id in item_ids:
+                if item_id in self._titles:
+                    self._assignments[item_id] = (self._assignments[item_id] | add) - remove
+                    self._reindex(item_id)
+    
+    def remove_item(self, item_id: int):
+        with self._lock:
+            self._titles.pop(item_id, None)
+            self._assignments.pop(item_id, None)
+            for token in self._tokens.pop(item_id, ()):
+                self._delete((token, item_id))
+
+    def __len__(self):
+        return len(self._titles)
+
+    def filter(self, text: str) -> List[int] | None:
+        """ids of all matching items sorted ASC, None if the text has no words (nothing to filter by)"""
+        words = set(normalize(text).split())
+        if not words:
+            return None
+
+        with self._lock:
+            # the word with the fewest matching tokens goes first, the rest only has to narrow it down
+            ranges = sorted(((self._prefix_bounds(word), word) for word in words), key=lambda r: r[0][1] - r[0][0])
+            (lo, hi), _ = ranges[0]
+            candidates = {id for _, id in self._by_token[lo:hi]}
+            for (lo, hi), word in ranges[1:]:
+                if not candidates:
+                    break
+                if len(candidates) * 8 < hi - lo: #cheaper to check the few remaining items directly
+                    candidates = {id for id in candidates if any(token.startswith(word) for token in self._tokens[id])}
+                else:
+                    candidates &= {id for _, id in self._by_token[lo:hi]}
+            return sorted(candidates)
+
+    #---internals, expect the lock to be held
+
+    @staticmethod
+    def _pair(item) -> Tuple[int, str]:
+        return (item.id, item.title) if hasattr(item, "title") else tuple(item)
+
+    @staticmethod
+    def _tokens_for(item_id: int, title: str, category_ids: Set[int], category_titles: Dict[int, str]) -> Set[str]:
+        tokens = set(normalize(title).split())
+        tokens.add(str(item_id))
+        for category_id in category_ids:
+            tokens.update(category_titles.get(category_id, "").split())
+        return tokens
+
+    def _reindex(self, item_id: int):
+        new = self._tokens_for(item_id, self._titles[item_id], self._assignments[item_id], self._category_titles)
+        old = self._tokens.get(item_id, set())
+        for token in old - new:
+            self._delete((token, item_id))
+        for token in new - old:
+            insort(self._by_token, (token, item_id))
+        self._tokens[item_id] = new
+
+    def _delete(self, entry: Tuple[str, int]):
+        i = bisect_left(self._by_token, entry)
+        if i < len(self._by_token) and self._by_token[i] == entry:
+            del self._by_token[i]
+
+    def _prefix_bounds(self, prefix: str) -> Tuple[int, int]:
+        return bisect_left(self._by_token, (prefix,)), bisect_right(self._by_token, (prefix + "\U0010ffff",))
@@ -1,17 +1,30 @@
+import re
 import sqlite3
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List
 from data.Topic import Topic
 from data.Category import Category
+from data.SearchResult import SearchResult
+from data.TopicSummary import TopicSummary
 from database.database_manager import Manager
 
 class TopicService:
     def __init__(self, db: Manager):
         self.db = db
+        self._has_fts = None #whether the full text index exists, checked on first search
+        self._listeners: List[Callable[[int], None]] = []
+    
+    def add_listener(self, callback: Callable[[int], None]):
+        """callback(topic_id) gets called after a topic was added, changed or removed through this service"""
+        self._listeners.append(callback)
+    
+    def _notify(self, topic_id: int):
+        for callback in self._listeners:
+            callback(topic_id)
     
     def list_all(self) -> List[Topic]:
         """Returns list of all topics sorted ASC by ID"""
-        query = self.db.execute("SELECT * from topics").fetchall()
-        return sorted([Topic(id, title, desc, source) for (id, title, desc, source) in query], key = lambda x: x.id)
+        query = self.db.execute("SELECT id, title, description, source from topics ORDER BY id").fetchall()
+        return [Topic(id, title, desc, source) for (id, title, desc, source) in query]
     
     def list_by_category(self, category_id: int | Category) -> List[Topic]:
         """Returns list of all Topics of a specific category sorted ASC by ID"""
@@ -20,22 +33,52 @@ class TopicService:
         
         query = self.db.execute("SELECT topics.id, topics.title, topics.description, topics.source from topics \
                                 INNER JOIN topicAssignment as TA on topics.id = ta.topic_id \
-                                WHERE ta.category_id=?", (category_id,)).fetchall()
-        return sorted([Topic(id, title, desc, source) for (id, title, desc, source) in query], key = lambda x: x.id)
+                                WHERE ta.category_id=? ORDER BY ta.topic_id", (category_id,)).fetchall()
+        return [Topic(id, title, desc, source) for (id, title, desc, source) in query]
+    
+    def list_summaries_by_category(self, category_id: int | Category, after_id: int = 0, limit: int = 50) -> List[TopicSummary]:
+        """Returns up to limit (id, title) pairs of a category with an ID greater than after_id, sorted ASC by ID.
+        Pass the ID of the last entry of a page to get the next one, an empty list means there is nothing left. limit -1 returns all"""
+        if isinstance(category_id, Category):
+            category_id = category_id.id
+        
+        # walks the (category_id, topic_id) index from after_id on, so later pages cost the same as the first one
+        query = self.db.execute("SELECT topics.id, topics.title from topicAssignment as TA \
+                                INNER JOIN topics on topics.id = ta.topic_id \
+                                WHERE ta.category_id=? AND ta.topic_id>? ORDER BY ta.topic_id LIMIT ?", (category_id, after_id, limit)).fetchall()
+        return [TopicSummary(id, title) for (id, title) in query]
 
     def get(self, topic_id: int) -> Topic | None:
         """Returns single topic based on integer ID provided"""
-        query = self.db.execute("SELECT * from topics WHERE id=?", (topic_id,)).fetchone()
+        query = self.db.execute("SELECT id, title, description, source from topics WHERE id=?", (topic_id,)).fetchone()
+        if not query:
+            return None
         id, title, desc, source = query
         return Topic(id, title,desc, source)
     
     def get_many(self, topic_ids: List[int]) -> List[Topic] | None:
-        """Returns list of topics based on IDs provided"""
-        sql="select * from topics where id in ({seq})".format(seq=','.join(['?']*len(topic_ids)))
+        """Returns list of topics based on IDs provided, in the same order. IDs without a topic are left out"""
+        return list(self.iter_many(topic_ids))
+    
+    def iter_many(self, topic_ids: Iterable[int], chunk_size: int = 500) -> Iterator[Topic]:
+        """Yields the topics for the IDs provided in the same order, loading chunk_size of them per query.
+        Works for any amount of IDs, sqlite limits the number of placeholders per query (999 on older versions)"""
+        chunk = []
+        for topic_id in topic_ids:
+            chunk.append(topic_id)
+            if len(chunk) >= chunk_size:
+                yield from self._load_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._load_chunk(chunk)
+    
+    def _load_chunk(self, topic_ids: List[int]) -> List[Topic]:
+        sql="select id, title, description, source from topics where id in ({seq})".format(seq=','.join(['?']*len(set(topic_ids))))
         #sqlite library does not provide a way to query with lists, so i have to join enough placeholders together for each entry in the list
         
-        query = self.db.execute(sql, topic_ids).fetchall()
-        return [Topic(id,title,desc, source) for (id, title, desc, source) in query]
+        query = self.db.execute(sql, tuple(set(topic_ids))).fetchall()
+        topics = {id: Topic(id,title,desc, source) for (id, title, desc, source) in query}
+        return [topics[id] for id in topic_ids if id in topics] #rows come back in whatever order sqlite likes
             
     def update(self, id: Topic | int, new_title: str | None = None, new_desc: str|None = None, new_source: str|None = None):
         """Updates Values for topics. If values are NoneType / have been left empty, the old value is used. EXCEPT WITH THE SOURCE LINK THIS WILL REMAIN EMPTY"""
@@ -46,31 +89,69 @@ class TopicService:
                 new_desc=id.description
             id=id.id
             
-        if not new_title:
-            new_title = self.get(id).title
-        if not new_desc:
-            new_desc = self.get(id).description  
-            
-        # makes it a lot simpler than having to construct custom queries for each case 
-        self.db.execute("UPDATE topics SET title=?, description=?, source=? WHERE id=?", (new_title, new_desc,new_source, id))
+        # makes it a lot simpler than having to construct custom queries for each case. Missing values are kept by the query itself,
+        # reading them with get() first would put the row from before the update back into the cache of CachedTopicService
+        self.db.execute("UPDATE topics SET title=COALESCE(NULLIF(?1, ''), title), description=COALESCE(NULLIF(?2, ''), description), source=?3 WHERE id=?4",
+                        (new_title or "", new_desc or "", new_source, id))
         self.db.commit_changes()
+        self._notify(id)
 
+    def update_fields(self, topic_id: int, **changed: str):
+        """Writes only the given columns (title, description and/or source) of a topic, e.g. update_fields(3, title="New")"""
+        unknown = set(changed) - {"title", "description", "source"}
+        if unknown:
+            raise ValueError(f"Topics have no field(s) {', '.join(sorted(unknown))}")
+        if not changed:
+            return
+        
+        columns = ", ".join(f"{column}=?" for column in changed) #column names are checked above, only the values come from outside
+        self.db.execute(f"UPDATE topics SET {columns} WHERE id=?", (*changed.values(), topic_id))
+        self.db.commit_changes()
+        self._notify(topic_id)
+    
     def get_assignments(self, topic_id: int) -> List[int]:
         """Returns list of category IDs a single topic is assigned to"""
         query = self.db.execute("SELECT category_id from topicAssignment as TA where topic_id=?", (topic_id,)).fetchall()
         return [value for (value,) in query]
     
+    def list_all_assignments(self) -> Dict[int, List[int]]:
+        """Category IDs of every topic in one query, topics without categories are left out"""
+        assignments = {}
+        for topic_id, category_id in self.db.execute("SELECT topic_id, category_id from topicAssignment").fetchall():
+            assignments.setdefault(topic_id, []).append(category_id)
+        return assignments
+    
     def set_assignment(self, topic_id: int, category_ids: List[int]):
         """Overwrides all Category assignments of a topic"""
         self.db.execute("DELETE FROM topicAssignment WHERE topic_id=?", (topic_id,)) #just remove all entries related to the topic
         self.db.execute_many("INSERT INTO topicAssignment (topic_id, category_id) VALUES (?, ?)", [(topic_id, category_id) for category_id in category_ids])
         self.db.commit_changes()
             
-    def add_topic(self):
+    def apply_assignment_diff(self, topic_id: int, add: Iterable[int] = (), remove: Iterable[int] = ()):
+        """Adds and removes single category assignments of a topic in one transaction, the others stay untouched"""
+        self.bulk_assign([topic_id], add, remove)
+    
+    def bulk_assign(self, topic_ids: Iterable[int], add: Iterable[int] = (), remove: Iterable[int] = ()):
+        """Adds the categories in add to every topic and removes the ones in remove, all in one transaction (one commit).
+        Existing assignments are left alone, a category in both add and remove ends up removed"""
+        topic_ids, add, remove = set(topic_ids), set(add), set(remove)
+        add -= remove
+        if not topic_ids or (not add and not remove):
+            return
+        with self.db.transaction():
+            if remove:
+                self.db.execute_many("DELETE FROM topicAssignment WHERE topic_id=? AND category_id=?", [(topic_id, category_id) for topic_id in topic_ids for category_id in remove])
+            if add:
+                self.db.execute_many("INSERT OR IGNORE INTO topicAssignment (topic_id, category_id) VALUES (?, ?)", [(topic_id, category_id) for topic_id in topic_ids for category_id in add])
+            
+    def add_topic(self) -> int:
+        """Adds a placeholder topic and returns its ID"""
         nt_amount = self.db.execute("SELECT id from topics where title LIKE 'New Topic'").fetchall()
         topic_name = f"New Topic {len(nt_amount) +1}"
-        self.db.execute("INSERT INTO topics (title, description,source) VALUES (?, 'Placeholder Description', '')", (topic_name,))
+        new_topic = self.db.execute("INSERT INTO topics (title, description,source) VALUES (?, 'Placeholder Description', '')", (topic_name,))
         self.db.commit_changes()
+        self._notify(new_topic.lastrowid)
+        return new_topic.lastrowid
     
     def remove_topic(self, topic_id: int | Topic):
         if isinstance(topic_id, Topic):
@@ -78,10 +159,34 @@ class TopicService:
         
         self.db.execute("DELETE FROM topics WHERE id=?", (topic_id,))
         self.db.commit_changes()
+        self._notify(topic_id)
         
     def search(self,text:str) -> List[int] | None:
-        """Returns a list of topic IDs matching the search query in their Title"""
-        query = self.db.execute("SELECT id FROM topics WHERE title LIKE ?", ('%'+text+'%',)).fetchall()
-        if not query or (not all(query)):
+        """Returns a list of topic IDs matching the search query in their title or description, best match first"""
+        results = self.search_ranked(text, limit=-1) #every match, sqlite treats a negative LIMIT as none
+        if not results:
             return None
-        return [id for (id,) in query]
\ No newline at end of file
+        return [result.id for result in results]
+    
+    def search_ranked(self, text: str, limit: int = 100, highlight: tuple = ("", "")) -> List[SearchResult]:
+        """Full text search over titles and descriptions. Every word of the text has to match as a word prefix, so half typed words already find something.
+        Results are ordered by bm25 with title hits weighted higher. highlight is put around matched words in the snippet, e.g. ("[b]", "[/b]") for kivy markup"""
+        words = re.findall(r"\w+", text)
+        if not words:
+            return []
+        
+        if not self._fts_available():
+            # no fts5 in this sqlite build, plain title search without ranking
+            query = self.db.execute("SELECT id, title FROM topics WHERE title LIKE ? ORDER BY id LIMIT ?", ('%'+text+'%', limit)).fetchall()
+            return [SearchResult(id, title, "", 0.0) for (id, title) in query]
+        
+        # every word gets quoted so user input can't be interpreted as fts syntax (AND, NEAR, column filters, ...)
+        match = " ".join(f'"{word}"*' for word in words)
+        query = self.db.execute("SELECT rowid, title, snippet(topics_fts, -1, ?, ?, '...', 12), bm25(topics_fts, 10.0, 1.0) AS score \
+                                FROM topics_fts WHERE topics_fts MATCH ? ORDER BY score LIMIT ?", (highlight[0], highlight[1], match, limit)).fetchall()
+        return [SearchResult(id, title, snippet or "", score) for (id, title, snippet, score) in query]
+    
+    def _fts_available(self) -> bool:
+        if self._has_fts is None:
+            self._has_fts = self.db.execute("SELECT 1 FROM sqlite_master WHERE name='topics_fts'").fetchone() is not None
+        return self._has_fts
\ No newline at end of file
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from database.database_manager import Manager
+from database.write_behind import WriteBehindQueue
+
+
+class UsageTracker:
+    """Records what visitors look at: opened topics, selected categories and how long a topic stayed open.
+    Recording only appends to an in-memory ring buffer, a background thread writes the events to usage_events in batches.
+    If the buffer overflows (e.g. the database is locked for a long time) the oldest events are dropped. Requires a pooled Manager."""
+    
+    VIEW = "view"
+    CATEGORY = "category"
+    DWELL = "dwell"
+    
+    def __init__(self, db: Manager, maxlen: int = 10000, batch_size: int = 100, interval: float = 5.0):
+        self.db = db
+        self.writer = WriteBehindQueue(db, "INSERT INTO usage_events (time, event, topic_id, category_id, seconds) VALUES (?,?,?,?,?)",
+                                       batch_size=batch_size, interval=interval, maxlen=maxlen, name="Usage Writer")
+    
+    def start(self):
+        self.writer.start()
+    
+    def topic_viewed(self, topic_id: int, category_id: int | None = None):
+        """category_id is the category the topic was opened from, None for search results"""
+        self.writer.put((datetime.now(), self.VIEW, topic_id, category_id, None))
+    
+    def category_selected(self, category_id: int):
+        self.writer.put((datetime.now(), self.CATEGORY, None, category_id, None))
+    
+    def dwell(self, topic_id: int, seconds: float):
+        """seconds the topic was shown for"""
+        self.writer.put((datetime.now(), self.DWELL, topic_id, None, seconds))
+    
+    def pending(self) -> int:
+        return self.writer.pending()
+    
+    def flush(self, timeout: float | None = None) -> bool:
+        return self.writer.flush(timeout)
+    
+    def stop(self, timeout: float | None = 5.0) -> bool:
+        """Writes the remaining events and ends the background writer"""
+        return self.writer.stop(timeout)
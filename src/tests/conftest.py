@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from database.database_manager import Manager
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """A migrated database file with the default schema"""
+    path = os.path.join(tmp_path, "test.db")
+    db = Manager(path)
+    db.ensure_database_availability()
+    db.close()
+    return path
+
+
+@pytest.fixture
+def db(db_path):
+    db = Manager(db_path)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def pooled_db(db_path):
+    """For everything with a background thread"""
+    db = Manager(db_path, pooled=True)
+    yield db
+    db.close()
+
+
+def add_topics(db: Manager, *titles: str) -> list:
+    ids = [db.execute("INSERT INTO topics (title, description, source) VALUES (?, 'description', '')", (title,)).lastrowid for title in titles]
+    db.commit_changes()
+    return ids
+
+
+def add_categories(db: Manager, *titles: str) -> list:
+    ids = [db.execute("INSERT INTO categories (title, angle_begin, angle_end) VALUES (?, 0, 0)", (title,)).lastrowid for title in titles]
+    db.commit_changes()
+    return ids
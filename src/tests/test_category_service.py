@@ -0,0 +1,24 @@
+from database.database_manager import Manager
+from services.CachedCategoryService import CachedCategoryService
+from services.CategoryService import CategoryService
+
+
+def test_layout_covers_the_whole_wheel(db):
+    cs = CategoryService(db)
+    cs.apply_layout({0: "A", 120: "B", 240: "C"})
+    assert [cs.get_for_angle(angle).title for angle in (0, 119, 120, 359, 360)] == ["A", "A", "B", "C", "A"]
+    assert cs.validate_ranges() == {"gaps": [], "overlaps": []}
+
+
+def test_angle_lookups_notice_layout_changes_of_other_processes(db_path, db):
+    cs = CachedCategoryService(db)
+    cs.VERSION_CHECK_INTERVAL = 0
+    cs.apply_layout({0: "A", 180: "B"})
+    assert cs.get_for_angle(200).title == "B"
+
+    config_tool = Manager(db_path)
+    CategoryService(config_tool).apply_layout({0: "C", 90: "A"})
+    config_tool.close()
+
+    assert cs.get_for_angle(200).title == "A"
+    assert [category.title for category in cs.list()] == ["C", "A"] #the cache was cleared as well
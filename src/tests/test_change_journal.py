@@ -0,0 +1,105 @@
+import pytest
+
+from services.ChangeJournal import ChangeJournal
+from services.TopicService import TopicService
+from tests.conftest import add_categories, add_topics
+
+
+def snapshot(db):
+    return (db.execute("SELECT * FROM topics ORDER BY id").fetchall(), db.execute("SELECT * FROM topicAssignment ORDER BY id").fetchall())
+
+
+def test_undo_and_redo_restore_each_step(db):
+    ts, journal = TopicService(db), ChangeJournal(db)
+    a, b = add_categories(db, "A", "B")
+    ids = add_topics(db, "one", "two")
+    states = [snapshot(db)]
+    with journal.record("edit"):
+        ts.update_fields(ids[0], title="first")
+        ts.apply_assignment_diff(ids[0], add=[a, b])
+    states.append(snapshot(db))
+    with journal.record("remove"):
+        ts.remove_topic(ids[1])
+    states.append(snapshot(db))
+    with journal.record("set"):
+        ts.set_assignment(ids[0], [b])
+    states.append(snapshot(db))
+
+    assert journal.undo() == {"topics": set(), "assignments": {ids[0]}}
+    assert snapshot(db) == states[2]
+    assert journal.undo() == {"topics": {ids[1]}, "assignments": set()}
+    assert journal.undo_label() == "edit"
+    journal.undo()
+    assert snapshot(db) == states[0]
+    assert journal.undo() is None
+
+    journal.redo()
+    journal.redo()
+    assert snapshot(db) == states[2]
+    assert journal.redo_label() == "set"
+
+
+def test_steps_without_changes_are_not_kept(db):
+    journal = ChangeJournal(db)
+    (topic_id,) = add_topics(db, "same")
+    with journal.record("nothing"):
+        TopicService(db).update_fields(topic_id, title="same")
+    assert journal.undo_label() is None
+
+
+def test_an_empty_step_keeps_the_redo_history(db):
+    journal = ChangeJournal(db)
+    (topic_id,) = add_topics(db, "a")
+    with journal.record("rename"):
+        TopicService(db).update_fields(topic_id, title="b")
+    journal.undo()
+    with journal.record("save without changes"):
+        pass
+    assert journal.redo_label() == "rename"
+
+
+def test_topics_with_null_columns_can_be_restored(db):
+    ts, journal = TopicService(db), ChangeJournal(db)
+    topic_id = db.execute("INSERT INTO topics (title, description, source) VALUES ('imported', '', NULL)").lastrowid
+    db.commit_changes()
+    with journal.record("remove"):
+        ts.remove_topic(topic_id)
+    journal.undo()
+    assert db.execute("SELECT title, source FROM topics WHERE id=?", (topic_id,)).fetchone() == ("imported", None)
+    with journal.record("rename"):
+        ts.update_fields(topic_id, title="renamed")
+    journal.undo()
+    assert db.execute("SELECT title, source FROM topics WHERE id=?", (topic_id,)).fetchone() == ("imported", None)
+
+
+def test_changes_outside_of_record_are_not_journaled(db):
+    journal = ChangeJournal(db)
+    add_topics(db, "imported")
+    assert db.execute("SELECT COUNT(*) FROM change_journal").fetchone()[0] == 0
+    assert journal.undo() is None
+
+
+def test_undo_refuses_rows_changed_elsewhere(db):
+    journal = ChangeJournal(db)
+    (topic_id,) = add_topics(db, "old")
+    with journal.record("rename"):
+        TopicService(db).update_fields(topic_id, title="new")
+    db.execute("UPDATE topics SET title='other' WHERE id=?", (topic_id,))
+    db.commit_changes()
+
+    with pytest.raises(ValueError):
+        journal.undo()
+    assert TopicService(db).get(topic_id).title == "other"
+    assert journal.undo_label() == "rename"
+
+
+def test_a_new_step_drops_the_redo_history(db):
+    ts, journal = TopicService(db), ChangeJournal(db)
+    (topic_id,) = add_topics(db, "a")
+    with journal.record("first"):
+        ts.update_fields(topic_id, title="b")
+    journal.undo()
+    with journal.record("second"):
+        ts.update_fields(topic_id, title="c")
+    assert journal.redo_label() is None
+    assert journal.undo_label() == "second"
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database.database_manager import Manager
+from database.migrations import MIGRATIONS
+from database.mirror_manager import MirrorManager
+from tests.conftest import add_topics
+
+
+def titles(db: Manager) -> list:
+    return [title for (title,) in db.execute("SELECT title FROM topics ORDER BY id").fetchall()]
+
+
+def test_pooled_threads_get_their_own_connection(pooled_db):
+    def work():
+        add_topics(pooled_db, threading.current_thread().name)
+        pooled_db.close_thread_connection()
+
+    threads = [threading.Thread(target=work, name=f"writer {i}") for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(titles(pooled_db)) == ["writer 0", "writer 1", "writer 2"]
+    assert len(pooled_db._connections) == 1 #only the one of this thread is left
+    assert pooled_db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_migrations_reach_the_newest_version(db):
+    assert db.schema_version() == MIGRATIONS[-1].version
+    assert db.migrate() == MIGRATIONS[-1].version #nothing left to do the second time
+
+
+def test_transaction_commits_once(db):
+    with db.transaction():
+        add_topics(db, "a", "b") #commit_changes inside does nothing
+        assert db.in_transaction()
+    assert not db.in_transaction()
+    assert titles(db) == ["a", "b"]
+
+
+def test_failed_transaction_is_rolled_back_as_a_whole(db):
+    add_topics(db, "existing")
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction():
+            db.execute("INSERT INTO topics (title) VALUES ('new')")
+            db.execute("INSERT INTO topics (title) VALUES ('existing')") #unique title, raises inside a transaction
+    assert titles(db) == ["existing"]
+
+
+def test_nested_transaction_only_rolls_back_the_inner_block(db):
+    with db.transaction():
+        db.execute("INSERT INTO topics (title) VALUES ('outer')")
+        with pytest.raises(ValueError):
+            with db.transaction():
+                db.execute("INSERT INTO topics (title) VALUES ('inner')")
+                raise ValueError()
+        db.execute("INSERT INTO topics (title) VALUES ('after')")
+    assert titles(db) == ["outer", "after"]
+
+
+def test_execute_outside_a_transaction_prints_and_returns_none(db, capsys):
+    assert db.execute("SELECT * FROM no_such_table") is None
+    assert "no such table" in capsys.readouterr().out
+
+
+def test_content_version_only_moves_for_explorer_content(db):
+    version = lambda: db.execute("SELECT version FROM content_version").fetchone()[0]
+    before = version()
+    db.execute("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES ('a', 'b', 'c', '3', '2024-01-01 10:00:00')")
+    db.execute("INSERT INTO usage_events (time, event) VALUES ('2024-01-01 10:00:00', 'category')")
+    db.commit_changes()
+    assert version() == before
+    add_topics(db, "topic")
+    assert version() == before + 1
+
+
+def test_mirror_only_reloads_for_explorer_content(db_path, db):
+    mirror = MirrorManager(db_path)
+    db.execute("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES ('a', 'b', 'c', '3', '2024-01-01 10:00:00')")
+    db.commit_changes()
+    assert not mirror.changed_on_disk()
+
+    add_topics(db, "topic")
+    assert mirror.changed_on_disk()
+    mirror.reload()
+    assert titles(mirror) == ["topic"]
+    with pytest.raises(sqlite3.OperationalError):
+        mirror.migrate()
+    mirror.close()
@@ -0,0 +1,26 @@
+import csv
+import sys
+
+import pytest
+
+from tools import export_guests
+
+
+def test_export_refuses_a_missing_database(tmp_path, monkeypatch):
+    missing = tmp_path / "missing.db"
+    monkeypatch.setattr(sys, "argv", ["export_guests", str(tmp_path / "out.csv"), "--db", str(missing)])
+    with pytest.raises(SystemExit) as exit:
+        export_guests.main()
+    assert exit.value.code != 0
+    assert not missing.exists()
+
+
+def test_export_includes_the_until_day(db_path, db, tmp_path, monkeypatch):
+    db.execute_many("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES (?, 'UDE', 'Student', '4', ?)",
+                    [("early", "2024-01-01 09:00:00"), ("inside", "2024-01-02 23:59:00"), ("late", "2024-01-03 00:00:00")])
+    db.commit_changes()
+    out = tmp_path / "out.csv"
+    monkeypatch.setattr(sys, "argv", ["export_guests", str(out), "--db", db_path, "--since", "2024-01-02", "--until", "2024-01-02"])
+    export_guests.main()
+    with open(out, newline="", encoding="utf-8") as f:
+        assert [row["name"] for row in csv.DictReader(f)] == ["inside"]
@@ -0,0 +1,92 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from data.Guest import Guest
+from services.GuestService import GuestService
+
+
+@pytest.fixture
+def guests(db) -> list:
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    rows = [(rng.choice(["anna", "Anton", "ben", "Berta", "carl"]) + str(i), rng.choice(["UDE", "ude", "RUB", ""]), rng.choice(["Student", "Teacher"]),
+             str(rng.choice([0, 3, 4.0, 5, "none"])), str(start + timedelta(hours=rng.randint(0, 24 * 60)))) for i in range(300)]
+    db.execute_many("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES (?, ?, ?, ?, ?)", rows)
+    db.commit_changes()
+    return GuestService(db).list()
+
+
+def expected(guests, name="", institution="", since=None, until=None) -> list:
+    matches = [g for g in guests if g.name.lower().startswith(name.lower()) and (not institution or g.institution.lower() == institution.lower())
+               and (since is None or g.date >= str(since)) and (until is None or g.date < str(until))]
+    if name:
+        matches.sort(key=lambda g: (g.name.lower(), g.id))
+    elif institution or since or until:
+        matches.sort(key=lambda g: (g.date, g.id))
+    return [g.id for g in matches]
+
+
+@pytest.mark.parametrize("filters", [{}, {"name": "an"}, {"name": "BERTA"}, {"institution": "ude"},
+                                     {"since": date(2024, 1, 10), "until": date(2024, 2, 1)},
+                                     {"institution": "RUB", "since": date(2024, 2, 1)}, {"name": "b", "institution": "UDE"}])
+def test_list_page_pages_through_every_match_once(db, guests, filters):
+    gs = GuestService(db)
+    seen, after = [], None
+    while page := gs.list_page(after, 7, **filters):
+        seen += [guest.id for guest in page]
+        after = page[-1]
+    assert seen == expected(guests, **filters)
+
+
+def test_list_page_uses_an_index(db):
+    plans = [db.explain("SELECT id FROM guests WHERE name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ? ORDER BY name COLLATE NOCASE, id LIMIT 5", ("a", "b")),
+             db.explain("SELECT id FROM guests WHERE institution = ? COLLATE NOCASE ORDER BY date, id LIMIT 5", ("ude",))]
+    assert all("INDEX" in " ".join(plan) and "TEMP B-TREE" not in " ".join(plan) for plan in plans)
+
+
+def test_iter_guests_range(db, guests):
+    since, until = date(2024, 1, 5), date(2024, 1, 20)
+    assert [g.id for g in GuestService(db).iter_guests(since, until, batch_size=4)] == expected(guests, since=since, until=until)
+
+
+def recount(guests, key) -> dict:
+    """rating distributions computed straight from the rows"""
+    counts = {}
+    for g in guests:
+        if g.purpose_of_visit in {"0", "1", "2", "3", "4", "5", "4.0"}:
+            counts.setdefault(key(g), {}).setdefault(int(float(g.purpose_of_visit)), 0)
+            counts[key(g)][int(float(g.purpose_of_visit))] += 1
+    return counts
+
+
+def test_rating_counters_follow_inserts_updates_and_deletes(db, guests):
+    gs = GuestService(db)
+    gs.add_entry(Guest(None, "new", "TU", "Student", "5", None))
+    db.execute("UPDATE guests SET purpose_of_visit='1', role='Teacher' WHERE id IN (1, 2, 3)")
+    gs.delete_entry(4)
+    db.commit_changes()
+    guests = gs.list()
+
+    assert {value: stats.distribution for value, stats in gs.rating_stats("role").items()} == recount(guests, lambda g: g.role)
+    assert {value: stats.distribution for value, stats in gs.rating_stats("day").items()} == recount(guests, lambda g: g.date[:10])
+    assert gs.rating_total().distribution == recount(guests, lambda g: "")[""]
+
+
+def test_guests_without_a_date_are_counted(db):
+    # a database from before the rating counts (version 4) that already holds a guest without a date
+    for name in ("guest_rating_counts_insert", "guest_rating_counts_delete", "guest_rating_counts_update"):
+        db.execute(f"DROP TRIGGER {name}")
+    db.execute("DROP TABLE guest_rating_counts")
+    db.execute("PRAGMA user_version=4")
+    db.execute("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES ('old', 'UDE', 'Student', '3', NULL)")
+    db.commit_changes()
+    assert db.migrate(5) == 5
+
+    db.execute("INSERT INTO guests (name, institution, role, purpose_of_visit, date) VALUES ('new', 'UDE', 'Student', '5', NULL)")
+    db.commit_changes()
+    gs = GuestService(db)
+    assert [guest.name for guest in gs.list()] == ["old", "new"]
+    assert gs.rating_stats("day")[""].distribution == {3: 1, 5: 1}
+    assert gs.rating_total().distribution == {3: 1, 5: 1}
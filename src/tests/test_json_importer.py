@@ -0,0 +1,57 @@
+import json
+import sys
+
+import pytest
+
+from tools.json_importer import import_topics, iter_entries, main
+from tests.conftest import add_categories
+
+ENTRIES = [{"title": f"Topic {i}", "description": "x" * (i * 7), "categories": ["a", "B"]} for i in range(40)]
+
+
+@pytest.mark.parametrize("as_array", [True, False])
+def test_iter_entries_streams_arrays_and_jsonl_across_chunk_borders(tmp_path, as_array):
+    path = tmp_path / "topics.json"
+    path.write_text(json.dumps(ENTRIES, indent=1) if as_array else "\n".join(json.dumps(entry) for entry in ENTRIES), encoding="utf-8")
+    assert list(iter_entries(str(path), chunk_size=16)) == ENTRIES
+
+
+def search(db, word) -> list:
+    return [title for (title,) in db.execute("SELECT title FROM topics_fts WHERE topics_fts MATCH ? ORDER BY rowid", (word,)).fetchall()]
+
+
+def test_import_upserts_topics_and_assignments(db):
+    add_categories(db, "A", "B")
+    counts = import_topics(db, iter(ENTRIES + [{"title": "Topic 1", "categories": ["unknown"]}, {"description": "no title"}]),
+                           batch_size=10, progress_every=0)
+    assert (counts["inserted"], counts["updated"], counts["skipped"], counts["assignments"]) == (40, 1, 1, 80)
+    assert counts["unknown_categories"] == {"unknown": 1}
+    assert db.execute("SELECT COUNT(*) FROM topics").fetchone()[0] == 40
+    # the search triggers were suspended during the import, the index got rebuilt at the end and the triggers are back
+    assert search(db, "39") == ["Topic 39"]
+    import_topics(db, iter([{"title": "Fresh"}]), progress_every=0)
+    assert search(db, "fresh") == ["Fresh"]
+
+
+def test_missing_fields_keep_their_old_values(db):
+    import_topics(db, iter([{"title": "A", "description": "keep", "source": "https://example.org"}]), progress_every=0)
+    import_topics(db, iter([{"title": "A"}, {"title": "B"}]), progress_every=0)
+    assert db.execute("SELECT title, description, source FROM topics ORDER BY id").fetchall() == [("A", "keep", "https://example.org"), ("B", "", None)]
+
+
+def test_dry_run_changes_nothing(db):
+    add_categories(db, "A")
+    counts = import_topics(db, iter(ENTRIES), dry_run=True, batch_size=10, progress_every=0)
+    assert counts["inserted"] == 40
+    assert db.execute("SELECT COUNT(*) FROM topics").fetchone()[0] == 0
+    assert db.execute("SELECT COUNT(*) FROM sqlite_master WHERE name='topics_fts_insert'").fetchone()[0] == 1
+
+
+def test_failed_import_exits_with_an_error(db_path, db, tmp_path, monkeypatch):
+    path = tmp_path / "broken.json"
+    path.write_text('[{"title": "first"}, {"title": ', encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["json_importer", str(path), "--db", db_path])
+    with pytest.raises(SystemExit) as exit:
+        main()
+    assert exit.value.code != 0
+    assert db.execute("SELECT COUNT(*) FROM topics").fetchone()[0] == 0
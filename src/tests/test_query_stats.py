@@ -0,0 +1,27 @@
+import threading
+
+from database.database_manager import Manager
+from database.query_stats import normalize_sql
+
+
+def test_normalize_sql_groups_literals_and_in_lists():
+    assert normalize_sql("SELECT * FROM t WHERE id IN (?, ?,?) AND x = 5 AND y='a'") == \
+           normalize_sql("SELECT *  FROM t\n WHERE id IN (?) AND x = 7 AND y='it''s'") == \
+           "SELECT * FROM t WHERE id IN (?...) AND x = ? AND y=?"
+
+
+def test_abandoned_cursors_are_not_explained_on_other_threads(db_path):
+    db = Manager(db_path, pooled=True)
+    stats = db.enable_stats(slow_ms=0)
+    cursor = db.execute("SELECT id FROM topics")
+    connections = len(db._connections)
+
+    holder = [cursor]
+    del cursor
+    thread = threading.Thread(target=holder.clear) #the cursor gets garbage collected on this thread
+    thread.start()
+    thread.join()
+
+    assert len(db._connections) == connections
+    assert stats.snapshot()["statements"][0]["plan"] is None
+    db.close()
@@ -0,0 +1,105 @@
+import pytest
+
+from services.CachedTopicService import CachedTopicService
+from services.TitleIndex import TitleIndex
+from services.TopicService import TopicService
+from tests.conftest import add_categories, add_topics
+
+
+@pytest.fixture(params=[TopicService, CachedTopicService])
+def ts(request, db):
+    return request.param(db)
+
+
+def test_summary_pages_cover_the_whole_category_once(db, ts):
+    category, other = add_categories(db, "A", "B")
+    ids = add_topics(db, *[f"topic {i}" for i in range(23)])
+    ts.bulk_assign(ids[::2], add=[category])
+    ts.bulk_assign(ids[1::2], add=[other])
+
+    seen, after = [], 0
+    while page := ts.list_summaries_by_category(category, after, 5):
+        assert len(page) <= 5
+        seen += [topic.id for topic in page]
+        after = page[-1].id
+    assert seen == [topic.id for topic in ts.list_by_category(category)] == ids[::2]
+
+
+def test_iter_many_keeps_the_order_and_skips_missing_ids(db, ts):
+    ids = add_topics(db, "a", "b", "c")
+    assert [topic.id for topic in ts.iter_many([ids[2], 999, ids[0], ids[2]], chunk_size=2)] == [ids[2], ids[0], ids[2]]
+
+
+def test_bulk_assign_adds_and_removes_for_every_topic(db, ts):
+    a, b, c = add_categories(db, "A", "B", "C")
+    ids = add_topics(db, "x", "y")
+    ts.set_assignment(ids[0], [a])
+    ts.bulk_assign(ids, add=[b, c], remove=[a, c]) #in both lists means removed
+    assert {topic_id: sorted(ts.get_assignments(topic_id)) for topic_id in ids} == {ids[0]: [b], ids[1]: [b]}
+    assert [topic.id for topic in ts.list_by_category(b)] == ids
+
+
+def test_search_returns_every_match(db, ts):
+    add_topics(db, *[f"planet {i}" for i in range(250)], "moon")
+    assert len(ts.search("plan")) == 250
+    assert len(ts.search_ranked("plan", limit=10)) == 10
+    assert ts.search("sun") is None
+
+
+def test_update_fields_only_writes_known_fields(db, ts):
+    (topic_id,) = add_topics(db, "old")
+    ts.update_fields(topic_id, title="new")
+    assert ts.get(topic_id).title == "new"
+    assert ts.get(topic_id).description == "description"
+    with pytest.raises(ValueError):
+        ts.update_fields(topic_id, id=5)
+
+
+def test_cached_service_sees_its_own_writes(db):
+    ts = CachedTopicService(db)
+    category, = add_categories(db, "A")
+    (topic_id,) = add_topics(db, "old")
+    ts.set_assignment(topic_id, [category])
+    assert [topic.title for topic in ts.list_summaries_by_category(category)] == ["old"]
+    assert ts.get(topic_id).title == "old"
+
+    ts.update_fields(topic_id, title="new")
+    assert ts.get(topic_id).title == "new"
+    assert [topic.title for topic in ts.list_summaries_by_category(category)] == ["new"]
+    assert [topic.title for topic in ts.list_all()] == ["new"]
+
+    ts.remove_topic(topic_id)
+    assert ts.get(topic_id) is None
+
+
+def test_title_index_follows_renames_and_removals_through_the_cache(db):
+    ts = CachedTopicService(db)
+    ids = add_topics(db, "Alpha", "Beta")
+    index = TitleIndex().attach(ts)
+    ts.get(ids[0]) #cached before the change
+
+    ts.update_fields(ids[0], title="Gamma")
+    assert [result.title for result in index.suggest("gam")] == ["Gamma"]
+    assert index.suggest("alp") == []
+
+    ts.remove_topic(ids[1])
+    assert index.suggest("bet") == []
+
+
+def test_update_keeps_missing_values_without_caching_the_old_row(db):
+    ts = CachedTopicService(db)
+    (topic_id,) = add_topics(db, "Alpha")
+    index = TitleIndex().attach(ts)
+    ts.update(topic_id, new_title="Gamma", new_desc=None, new_source="s")
+    assert (ts.get(topic_id).title, ts.get(topic_id).description, ts.get(topic_id).source) == ("Gamma", "description", "s")
+    assert [result.title for result in index.suggest("gam")] == ["Gamma"]
+    assert index.suggest("alp") == []
+
+
+def test_cached_chunks_dont_query(db):
+    ts = CachedTopicService(db)
+    ids = add_topics(db, "a", "b")
+    ts.get_many(ids)
+    stats = db.enable_stats()
+    assert [topic.id for topic in ts.get_many(ids)] == ids
+    assert stats.snapshot()["statements"] == []
@@ -0,0 +1,33 @@
+from datetime import date
+
+from services.PopularityRanker import PopularityRanker
+from services.UsageTracker import UsageTracker
+from tests.conftest import add_topics
+
+
+def test_views_end_up_in_the_daily_counters(pooled_db):
+    usage = UsageTracker(pooled_db, interval=30.0)
+    usage.start()
+    for _ in range(3):
+        usage.topic_viewed(7, 1)
+    usage.topic_viewed(8)
+    usage.category_selected(1)
+    usage.dwell(7, 12.5)
+    assert usage.stop(timeout=5)
+
+    assert pooled_db.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0] == 6
+    assert dict(pooled_db.execute("SELECT topic_id, views FROM topic_view_days").fetchall()) == {7: 3, 8: 1}
+
+
+def test_ranker_weights_recent_views_higher(db):
+    ids = add_topics(db, "old favourite", "new favourite", "never viewed")
+    db.execute_many("INSERT INTO topic_view_days (day, topic_id, views) VALUES (?, ?, ?)",
+                    [("2024-01-01", ids[0], 10), ("2024-01-29", ids[1], 6)])
+    db.commit_changes()
+
+    ranker = PopularityRanker(db, half_life_days=14)
+    ranker.refresh(today=date(2024, 1, 29))
+    assert ranker.score(ids[0]) == 10 * 0.5 ** 2
+    assert ranker.score(ids[1]) == 6
+    topics = [type("Item", (), {"id": id})() for id in (ids[2], ids[0], ids[1])]
+    assert [topic.id for topic in ranker.rank(topics)] == [ids[1], ids[0], ids[2]]
@@ -0,0 +1,67 @@
+import sqlite3
+import time
+
+from database.database_manager import Manager
+from database.write_behind import WriteBehindQueue
+
+INSERT = "INSERT INTO usage_events (time, event, topic_id, category_id, seconds) VALUES (?, 'view', ?, NULL, NULL)"
+
+
+def events(db: Manager) -> int:
+    return db.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0]
+
+
+def test_flush_writes_a_backlog_of_several_batches_without_waiting_for_the_interval(pooled_db):
+    queue = WriteBehindQueue(pooled_db, INSERT, batch_size=100, interval=30.0)
+    queue.start()
+    queue.put_many(("2024-01-01", i) for i in range(250))
+
+    start = time.monotonic()
+    assert queue.stop(timeout=5)
+    assert time.monotonic() - start < 2
+    assert queue.pending() == 0
+    assert events(pooled_db) == 250
+
+
+def test_failed_batches_stay_queued_and_are_retried(db_path, pooled_db):
+    pooled_db.timeout = 0.1 #fail fast while the other connection holds the lock
+    queue = WriteBehindQueue(pooled_db, INSERT, batch_size=10, interval=0.05, max_backoff=0.2)
+    queue.start()
+
+    locker = sqlite3.connect(db_path)
+    locker.execute("BEGIN IMMEDIATE")
+    queue.put_many(("2024-01-01", i) for i in range(3))
+    assert not queue.flush(timeout=0.5)
+    assert queue.pending() == 3
+    locker.rollback()
+    locker.close()
+
+    assert queue.stop(timeout=5)
+    assert queue.pending() == 0
+    assert [topic_id for (topic_id,) in pooled_db.execute("SELECT topic_id FROM usage_events ORDER BY id").fetchall()] == [0, 1, 2]
+
+
+def test_empty_flush_doesnt_keep_the_writer_busy(pooled_db):
+    queue = WriteBehindQueue(pooled_db, INSERT, interval=0.2)
+    queue.start()
+    assert queue.flush(timeout=1)
+    cpu = time.process_time()
+    time.sleep(0.5)
+    assert time.process_time() - cpu < 0.2 #the writer waits for the interval instead of spinning
+    queue.put(("2024-01-01", 1))
+    assert queue.stop(timeout=5)
+    assert events(pooled_db) == 1
+
+
+def test_flush_without_thread_writes_right_away(pooled_db):
+    queue = WriteBehindQueue(pooled_db, INSERT, batch_size=2)
+    queue.put_many(("2024-01-01", i) for i in range(5))
+    assert queue.flush()
+    assert events(pooled_db) == 5
+
+
+def test_ring_buffer_drops_the_oldest_rows(pooled_db):
+    queue = WriteBehindQueue(pooled_db, INSERT, maxlen=3)
+    queue.put_many(("2024-01-01", i) for i in range(5))
+    queue.flush()
+    assert [topic_id for (topic_id,) in pooled_db.execute("SELECT topic_id FROM usage_events ORDER BY id").fetchall()] == [2, 3, 4]
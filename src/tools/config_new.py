@@ -11,7 +11,7 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
 from kivy.properties import NumericProperty
 
-import math, threading
+import math, threading, time
 from hardware.tlv493d import TLV493D
 from database.database_manager import Manager
 from services.CategoryService import CategoryService
@@ -134,36 +134,27 @@ class ConfirmPopup(Popup):
         dismiss_button.bind(on_press=self.dismiss)
     
     def _confirm(self, _):
+        success = True
         if self.data:
-            self.angles_to_database(self.data)
+            success = self.angles_to_database(self.data)
 
         end_layout = BoxLayout(orientation="vertical")
-        end_layout.add_widget(Label(text="Successfully commited to database"))
+        end_layout.add_widget(Label(text="Successfully commited to database" if success else "Failed, the previous layout was kept"))
         end_button = Button(text="Ok")
         end_button.bind(on_press=self.dismiss)
         end_layout.add_widget(end_button)
         self.content=end_layout
         self.auto_dismiss=True
 
-    def angles_to_database(self, data: dict):
-        slice_angles = list(data.keys())
-        slice_names = list(data.values())
-        
-        all_categories = self.cs.list()
-        #check if there are any existing categories to later just be updated
-        for name in slice_names:
-            existing_category = self.cs.get_for_title(name)
-            if existing_category:
-                print(f"Found: {existing_category}")
-                all_categories.remove(existing_category)
-        
-        #deleting all categories to be replaced
-        for category in all_categories:
-            self.cs.delete_category(category, True)
-        
-        for i in range(len(slice_angles)):
-            self.cs.create_category(slice_names[i],slice_angles[i],(slice_angles[(i+1) % len(slice_angles)]-1),True)
-                                                                    # -1 to remove overlap
+    def angles_to_database(self, data: dict) -> bool:
+        start = time.perf_counter()
+        try:
+            self.cs.apply_layout(data) #all slices in a single transaction, a failure leaves the old layout untouched
+        except Exception as e:
+            print(f"Applying the layout failed: {e}")
+            return False
+        print(f"Applied {len(data)} slices in {(time.perf_counter()-start)*1000:.1f} ms")
+        return True
 
 class StartupScreen(Screen):
     def __init__(self, **kw):
@@ -0,0 +1,72 @@
+"""Exports the guestbook to csv or jsonl. Rows are streamed in batches, exporting years of visitors needs as little memory as a day.
+Run from the src folder, e.g.:
+    python -m tools.export_guests guests.csv --since 2025-09-01 --until 2025-09-30
+    python -m tools.export_guests - --format jsonl > guests.jsonl"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Iterable, TextIO
+
+from data.Guest import Guest
+from database.database_manager import Manager, DEFAULT_DB_PATH
+from services.GuestService import GuestService
+
+FIELDS = ("id", "name", "institution", "role", "purpose_of_visit", "date")
+
+
+def write_csv(guests: Iterable[Guest], out: TextIO) -> int:
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    count = 0
+    for guest in guests:
+        writer.writerow(tuple(guest))
+        count += 1
+    return count
+
+
+def write_jsonl(guests: Iterable[Guest], out: TextIO) -> int:
+    count = 0
+    for guest in guests:
+        out.write(json.dumps(dict(zip(FIELDS, guest)), ensure_ascii=False, default=str) + "\n")
+        count += 1
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="file to write, - for stdout")
+    parser.add_argument("--format", choices=WRITERS.keys(), help="defaults to the file extension, csv for stdout")
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to export (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="last day to export (YYYY-MM-DD), inclusive")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows fetched per round trip")
+    args = parser.parse_args()
+
+    format = args.format or ("jsonl" if args.output.endswith((".jsonl", ".json")) else "csv")
+    until = args.until + timedelta(days=1) if args.until else None #iter_guests excludes until, the command line includes the whole day
+
+    if not os.path.exists(args.db): #sqlite would create an empty database and the export would be empty too
+        sys.exit(f"Database {args.db} does not exist")
+    db = Manager(args.db)
+    gs = GuestService(db)
+    start = time.perf_counter()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        count = WRITERS[format](gs.iter_guests(args.since, until, args.batch_size), out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+    # stderr, stdout might be the export itself
+    print(f"Exported {count} guests as {format} in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
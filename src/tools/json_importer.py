@@ -1,54 +1,175 @@
-
+"""Imports topics and their category assignments from a json file into the database.
+The file is either a json array of topic objects (like data_categorized.json) or one object per line (jsonl).
+Each object needs a "title", "description", "source" and "categories" (list of category titles) are optional.
+Topics are matched by title: existing ones get their description/source updated (fields missing in the file are kept), new ones are inserted.
+Run from the src folder, e.g.:
+    python -m tools.json_importer tools/data_categorized.json --dry-run"""
+import argparse
 import json
-from database.database_manager import Manager
-
-# Mapping category names to IDs
-CATEGORY_ID_MAP = {
-    "Societal Impact": 1,
-    "Experimental Learning": 2,
-    "AI in Education": 3,
-    "Technology enhanced learning": 4,
-    "Programming education": 5,
-    "Educational Data Science": 6,
-    "Methodology & Meta-Research": 7
-}
-
-def insert_topics_and_assignments(json_path):
-    # Load data from JSON file
-    with open(json_path, "r") as f:
-        data = json.load(f)
-
-    # Initialize database manager
-    db = Manager()
+import sys
+import time
+from typing import Dict, Iterator, List
+
+from database.database_manager import Manager, DEFAULT_DB_PATH
+from database.migrations import TOPIC_SEARCH_TRIGGERS
+
+
+class _DryRun(Exception):
+    """raised at the end of a dry run so the transaction gets rolled back"""
+
+
+def iter_entries(path: str, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Yields the objects of a json array or of a jsonl file one by one, without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        position = 0
+        eof = False
+        while True:
+            # separators between the objects: whitespace, the brackets of the array and commas
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            if position >= len(buffer):
+                if eof:
+                    return
+                buffer, position = f.read(chunk_size), 0
+                eof = not buffer
+                continue
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size) #object is cut off at the end of the buffer
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            position = end
+            yield entry
+
+
+def category_ids(db: Manager) -> Dict[str, int]:
+    """casefolded category title -> id, straight from the categories table"""
+    return {title.casefold(): id for id, title in db.execute("SELECT id, title FROM categories").fetchall()}
+
+
+def _has_search_index(db: Manager) -> bool:
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name='topics_fts'").fetchone() is not None
+
+
+def _suspend_search_index(db: Manager):
+    """Updating the full text index row by row takes most of the time of a large import, rebuilding it once at the end is a lot faster"""
+    db.execute("DROP TRIGGER IF EXISTS topics_fts_insert")
+    db.execute("DROP TRIGGER IF EXISTS topics_fts_update")
+
+
+def _resume_search_index(db: Manager):
+    db.execute(TOPIC_SEARCH_TRIGGERS["topics_fts_insert"])
+    db.execute(TOPIC_SEARCH_TRIGGERS["topics_fts_update"])
+    db.execute("INSERT INTO topics_fts (topics_fts) VALUES ('rebuild')")
+
+
+def _chunks(entries: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_topics(db: Manager, entries: Iterator[dict], dry_run: bool = False, batch_size: int = 500, progress_every: int = 1000) -> dict:
+    """Upserts the topics and adds their category assignments, all in one transaction. Assignments that already exist are left alone.
+    With dry_run everything is done and counted, then rolled back. Returns the counts.
+    Imports of more than one batch rebuild the search index once at the end instead of updating it per topic"""
+    counts = {"read": 0, "inserted": 0, "updated": 0, "assignments": 0, "skipped": 0, "unknown_categories": {}}
+    categories = category_ids(db)
+    start = time.perf_counter()
+    next_progress = progress_every
+    suspended = False
+
+    try:
+        with db.transaction():
+            for batch in _chunks(entries, batch_size):
+                if counts["read"] and not suspended and _has_search_index(db): #second batch, it's a large import
+                    _suspend_search_index(db)
+                    suspended = True
+                counts["read"] += len(batch)
+                topics = {}
+                for entry in batch:
+                    title = str(entry.get("title") or "").strip() if isinstance(entry, dict) else ""
+                    if not title:
+                        counts["skipped"] += 1
+                        continue
+                    topics[title] = entry #the last one wins if a title shows up twice
+
+                # batch_size stays below sqlite's placeholder limit
+                titles = list(topics)
+                placeholders = ",".join(["?"] * len(titles))
+                existing = {title for (title,) in db.execute(f"SELECT title FROM topics WHERE title IN ({placeholders})", titles).fetchall()}
+                counts["updated"] += len(existing)
+                counts["inserted"] += len(titles) - len(existing)
+
+                # a missing description is inserted as "" for new topics, but keeps the old one of existing topics, like the source
+                db.execute_many("INSERT INTO topics (title, description, source) VALUES (?1, COALESCE(?2, ''), ?3) \
+                                ON CONFLICT(title) DO UPDATE SET description=COALESCE(?2, topics.description), source=COALESCE(excluded.source, topics.source)",
+                                [(title, entry.get("description"), entry.get("source")) for title, entry in topics.items()])
+                ids = dict(db.execute(f"SELECT title, id FROM topics WHERE title IN ({placeholders})", titles).fetchall())
+
+                assignments = []
+                for title, entry in topics.items():
+                    for category in entry.get("categories") or []:
+                        category_id = categories.get(str(category).strip().casefold())
+                        if category_id is None:
+                            counts["unknown_categories"][category] = counts["unknown_categories"].get(category, 0) + 1
+                            continue
+                        assignments.append((ids[title], category_id))
+                if assignments:
+                    cursor = db.execute_many("INSERT OR IGNORE INTO topicAssignment (topic_id, category_id) VALUES (?, ?)", assignments)
+                    counts["assignments"] += cursor.rowcount #ignored rows and changes made by triggers don't count
+
+                if progress_every and counts["read"] >= next_progress:
+                    elapsed = time.perf_counter() - start
+                    print(f"{counts['read']} topics read, {counts['read'] / elapsed:.0f} topics/s")
+                    next_progress += progress_every
+            if suspended:
+                _resume_search_index(db) #still inside the transaction, a failed import leaves the triggers in place
+            if dry_run:
+                raise _DryRun()
+    except _DryRun:
+        pass
+
+    counts["seconds"] = time.perf_counter() - start
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="tools/data_categorized.json")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="database file to import into")
+    parser.add_argument("--dry-run", action="store_true", help="check and count everything, but don't keep any changes")
+    parser.add_argument("--batch-size", type=int, default=500, help="topics per executemany, at most 999")
+    parser.add_argument("--progress", type=int, default=1000, help="print the progress every n topics, 0 to turn it off")
+    args = parser.parse_args()
+
+    db = Manager(args.db)
     db.ensure_database_availability()
+    try:
+        counts = import_topics(db, iter_entries(args.path), args.dry_run, min(args.batch_size, 999), args.progress)
+    except Exception as e: #the transaction is rolled back at this point, nothing was imported
+        sys.exit(f"Import failed, nothing was changed: {e}") #non-zero status, so scripts notice
+    finally:
+        db.close()
+
+    seconds = counts["seconds"]
+    print(f"{'Dry run, nothing was saved. ' if args.dry_run else ''}"
+          f"Read {counts['read']} topics in {seconds:.2f} s ({counts['read'] / seconds if seconds else 0:.0f} topics/s): "
+          f"{counts['inserted']} new, {counts['updated']} updated, {counts['skipped']} skipped without title, {counts['assignments']} new assignments.")
+    for category, amount in counts["unknown_categories"].items():
+        print(f"Unknown category '{category}' ({amount} topics), create it first e.g. with the config tool")
 
-    # Insert topics
-    topic_data = [(entry["title"], entry.get("description", "")) for entry in data]
-    db.execute_many("INSERT OR IGNORE INTO topics (title, description) VALUES (?, ?)", topic_data)
-    db.commit_changes()
-
-    # Fetch topic IDs
-    topic_id_map = {
-        title: id_ for id_, title in db.execute("SELECT id, title FROM topics").fetchall()
-    }
-
-    # Prepare topicAssignments (topic_id, slice_id = category_id)
-    assignment_data = []
-    for entry in data:
-        topic_id = topic_id_map.get(entry["title"])
-        for category in entry.get("categories", []):
-            cat_id = CATEGORY_ID_MAP.get(category)
-            if topic_id and cat_id:
-                assignment_data.append((topic_id, cat_id))
-
-    # Insert into topicAssignment
-    db.execute_many(
-        "INSERT OR IGNORE INTO topicAssignment (topic_id, slice_id) VALUES (?, ?)",
-        assignment_data
-    )
-    db.commit_changes()
-
-    print(f"Inserted {len(topic_data)} topics and {len(assignment_data)} topicAssignments.")
 
 if __name__ == "__main__":
-    insert_topics_and_assignments("data_categorized.json")
+    main()
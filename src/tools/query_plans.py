@@ -0,0 +1,35 @@
+"""Prints the query plans of the service queries before and after migrating. Works on an in-memory copy, the database file stays untouched.
+Run from the src folder: python -m tools.query_plans [path to database]"""
+import sys
+
+from database.database_manager import Manager, DEFAULT_DB_PATH
+
+SERVICE_QUERIES = {
+    "TopicService.list_by_category": ("SELECT topics.id, topics.title, topics.description, topics.source from topics \
+                                INNER JOIN topicAssignment as TA on topics.id = ta.topic_id \
+                                WHERE ta.category_id=? ORDER BY ta.topic_id", (1,)),
+    "TopicService.get_assignments": ("SELECT category_id from topicAssignment as TA where topic_id=?", (1,)),
+    "TopicService.set_assignment (delete)": ("DELETE FROM topicAssignment WHERE topic_id=?", (1,)),
+    "TopicService.get": ("SELECT id, title, description, source from topics WHERE id=?", (1,)),
+}
+
+
+def print_plans(db: Manager, label: str):
+    print(f"--- {label} (schema version {db.schema_version()}) ---")
+    for name, (query, params) in SERVICE_QUERIES.items():
+        print(name)
+        for step in db.explain(query, params):
+            print(f"    {step}")
+
+
+def main(path: str):
+    db = Manager(":memory:")
+    db.load_copy(path)
+    
+    print_plans(db, "before")
+    db.migrate()
+    print_plans(db, "after")
+    
+    
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
@@ -0,0 +1,28 @@
+"""Prints a summary of a query statistics dump (see Manager.enable_stats / dump_stats).
+Run from the src folder: python -m tools.query_stats [path to dump] [amount of statements to show]"""
+import json
+import sys
+
+
+def main(path: str, top: int):
+    with open(path) as f:
+        data = json.load(f)
+    
+    statements = data["statements"]
+    total = sum(s["total_ms"] for s in statements) or 1
+    print(f"{len(statements)} statements, {sum(s['count'] for s in statements)} executions, {total:.1f} ms in total\n")
+    
+    print(f"{'total ms':>10} {'share':>6} {'count':>7} {'avg ms':>8} {'max ms':>8} {'rows':>8} {'errors':>6}  statement")
+    for s in statements[:top]:
+        print(f"{s['total_ms']:>10.1f} {s['total_ms']/total:>6.1%} {s['count']:>7} {s['avg_ms']:>8.3f} {s['max_ms']:>8.3f} {s['rows']:>8} {s['errors']:>6}  {s['sql'][:100]}")
+    
+    slow = data["slow_queries"]
+    print(f"\n{len(slow)} queries slower than {data['slow_ms']} ms")
+    for query in slow[-top:]:
+        print(f"{query['ms']:>10.1f} ms  {query['sql'][:100]}  {query['params']}")
+        for step in query["plan"] or []:
+            print(f"{'':>16}{step}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "./query_stats.json", int(sys.argv[2]) if len(sys.argv) > 2 else 15)
@@ -6,16 +6,23 @@ from kivy.properties import ObjectProperty
 
 class SearchBar(TextInput):
     callback=ObjectProperty(None)
-    def __init__(self, ts:TopicService, hint_text:str, callback, **kwargs):
+    type_callback=ObjectProperty(None) #called on every keystroke, for live suggestions
+    def __init__(self, ts:TopicService, hint_text:str, callback, type_callback=None, **kwargs):
         super().__init__(**kwargs)
         
         self.ts=ts    
         self.callback=callback 
+        self.type_callback=type_callback
 
         self.hint_text=hint_text
         self.multiline = False # change if necessary
         self.bind(on_text_validate=self.on_enter)
+        self.bind(text=self.on_type)
     
     def on_enter(self, instance):
         if callable(self.callback):
-            self.callback(instance.text)
\ No newline at end of file
+            self.callback(instance.text)
+    
+    def on_type(self, instance, text):
+        if callable(self.type_callback):
+            self.type_callback(text)
\ No newline at end of file